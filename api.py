@@ -0,0 +1,13 @@
+import os
+
+# Point FPL_API_BASE at a stand-in server (see benchmarks/mock_fpl.py) to run offline
+API_BASE = os.getenv("FPL_API_BASE", "https://fantasy.premierleague.com/api").rstrip("/")
+
+BOOTSTRAP_URL = f"{API_BASE}/bootstrap-static/"
+LEAGUE_URL = API_BASE + "/leagues-classic/{league_id}/standings/"
+STANDINGS_URL = API_BASE + "/leagues-classic/{league_id}/standings/?page_standings={page}"
+ENTRY_HISTORY_URL = API_BASE + "/entry/{entry_id}/history"
+EVENT_LIVE_URL = API_BASE + "/event/{event_id}/live/"
+ELEMENT_SUMMARY_URL = API_BASE + "/element-summary/{element_id}/"
+ENTRY_PICKS_URL = API_BASE + "/entry/{entry_id}/event/{event_id}/picks/"
+FIXTURES_URL = API_BASE + "/fixtures/?event={event_id}"
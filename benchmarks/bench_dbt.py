@@ -0,0 +1,125 @@
+""" Time Power BI refreshes against the bronze views and against the silver/gold models.
+
+    Usage: python benchmarks/bench_dbt.py [--project dbt_fpl_analytics] [--repeat 5] [--skip-build]
+
+    Needs dbt-postgres on PATH with a profile for the project, and connects
+    with the same environment variables as main.py. Reports two things:
+
+    - build: `dbt run` of silver and gold with --full-refresh, then again
+      incrementally, which rebuilds only the last two gameweeks
+    - queries: each dashboard query for one league computed from the bronze
+      views (what a refresh did before the gold layer) and read from gold"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import connect_to_db
+
+# (bronze query, gold query) per dashboard visual, both filtered to one league
+QUERIES = {
+    "standings history": ("""
+        SELECT g.game_week, g.team_id, p.player_name, g.total_points,
+               rank() OVER (PARTITION BY g.game_week ORDER BY g.total_points DESC) AS league_rank
+        FROM {bronze_gw_events} g LEFT JOIN {bronze_player_details} p ON p.team_id = g.team_id
+        WHERE g.league_id = %(league_id)s
+    """, """
+        SELECT game_week, team_id, manager_name, total_points, league_rank
+        FROM {gold_league_standings_history} WHERE league_id = %(league_id)s
+    """),
+    "rank movement": ("""
+        WITH ranked AS (
+            SELECT game_week, team_id,
+                   rank() OVER (PARTITION BY game_week ORDER BY total_points DESC) AS league_rank
+            FROM {bronze_gw_events} WHERE league_id = %(league_id)s
+        )
+        SELECT game_week, team_id, league_rank,
+               lag(league_rank) OVER (PARTITION BY team_id ORDER BY game_week) - league_rank AS change
+        FROM ranked
+    """, """
+        SELECT game_week, team_id, league_rank, league_rank_change
+        FROM {gold_rank_movement} WHERE league_id = %(league_id)s
+    """),
+    "gameweek summary": ("""
+        SELECT game_week, count(*), avg(weeks_points), max(weeks_points),
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY weeks_points), sum(transfer_cost)
+        FROM {bronze_gw_events} WHERE league_id = %(league_id)s GROUP BY game_week
+    """, """
+        SELECT game_week, managers, avg_points, max_points, median_points, hit_cost
+        FROM {gold_gameweek_summary} WHERE league_id = %(league_id)s
+    """),
+    "transfer efficiency": ("""
+        SELECT game_week, team_id,
+               weeks_points - avg(weeks_points) OVER (PARTITION BY game_week) AS vs_avg,
+               sum(transfer_cost) OVER (PARTITION BY team_id ORDER BY game_week) AS season_hit_cost
+        FROM {bronze_gw_events} WHERE league_id = %(league_id)s
+    """, """
+        SELECT game_week, team_id, points_vs_league_avg, season_hit_cost
+        FROM {gold_transfer_efficiency} WHERE league_id = %(league_id)s
+    """),
+}
+
+
+def relations(conn):
+    """ Schema-qualified name of every bronze and gold model, wherever the target put them"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT table_name, table_schema FROM information_schema.tables
+        WHERE table_name LIKE 'bronze\\_%' OR table_name LIKE 'gold\\_%'
+    """)
+    return {name: f'"{schema}"."{name}"' for name, schema in cursor.fetchall()}
+
+
+def dbt_run(project, *args):
+    start = time.perf_counter()
+    subprocess.run(["dbt", "run", "--select", "silver", "gold", *args], cwd=project, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def best_of(repeat, cursor, sql, params):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--project", default=os.path.join(os.path.dirname(__file__), "..", "dbt_fpl_analytics"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-build", action="store_true", help="reuse the models already built")
+    args = parser.parse_args()
+
+    if not args.skip_build:
+        full = dbt_run(args.project, "--full-refresh")
+        incremental = dbt_run(args.project)
+        print(f"{'dbt run':<24}{'full s':>12}{'incremental s':>16}{'speedup':>10}")
+        print(f"{'silver + gold':<24}{full:>12.2f}{incremental:>16.2f}{full / incremental:>9.1f}x\n")
+
+    conn = connect_to_db()
+    try:
+        names = relations(conn)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT league_id FROM {names['gold_gameweek_summary']} "
+                       f"GROUP BY league_id ORDER BY sum(managers) DESC LIMIT 1")
+        params = {"league_id": cursor.fetchone()[0]}
+
+        print(f"{'dashboard query':<24}{'bronze s':>12}{'gold s':>16}{'speedup':>10}")
+        for label, (before, after) in QUERIES.items():
+            bronze_seconds = best_of(args.repeat, cursor, before.format(**names), params)
+            gold_seconds = best_of(args.repeat, cursor, after.format(**names), params)
+            print(f"{label:<24}{bronze_seconds:>12.4f}{gold_seconds:>16.4f}"
+                  f"{bronze_seconds / gold_seconds:>9.1f}x")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+""" Compare the COPY-based bulk upsert against the row-by-row execute path.
+
+    Usage: python benchmarks/bench_loader.py [rows_per_table]
+
+    Connects with the same environment variables as main.py and runs every
+    load inside a transaction that is rolled back, so the fpl.* tables are
+    left untouched. Synthetic rows are generated from each table's column types."""
+import os
+import sys
+import time
+import random
+import string
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import connect_to_db
+from loader import ensure_hash_column, row_upsert, upsert_table
+from tables import ALL_TABLES
+
+
+def column_types(conn, table):
+    schema, name = table.name.split(".")
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s
+    """, (schema, name))
+    return dict(cursor.fetchall())
+
+
+def synthetic_value(data_type, i):
+    if data_type in ("integer", "bigint", "smallint"):
+        return i
+    if data_type in ("numeric", "double precision", "real"):
+        return round(random.uniform(0, 100), 2)
+    if data_type == "boolean":
+        return i % 2 == 0
+    if data_type.startswith("timestamp") or data_type == "date":
+        return "2024-08-16"
+    return "".join(random.choices(string.ascii_letters, k=12))
+
+
+def synthetic_rows(conn, table, n):
+    types = column_types(conn, table)
+    return [tuple(synthetic_value(types.get(col, "text"), i) for col in table.columns)
+            for i in range(1, n + 1)]
+
+
+def timed(conn, load):
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    conn.rollback()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    conn = connect_to_db()
+
+    print(f"{'table':<24}{'rows':>8}{'row-by-row rows/s':>20}{'bulk rows/s':>14}{'speedup':>9}")
+    for table in ALL_TABLES:
+        if table.hash_column:
+            ensure_hash_column(conn, table.name, table.hash_column)
+        rows = synthetic_rows(conn, table, n)
+        row_time = timed(conn, lambda: row_upsert(conn, table.name, table.columns, rows,
+                                                  table.conflict_columns, table.update_columns))
+        bulk_time = timed(conn, lambda: upsert_table(conn, table, rows))
+        print(f"{table.name:<24}{n:>8}{n / row_time:>20.0f}{n / bulk_time:>14.0f}"
+              f"{row_time / bulk_time:>8.1f}x")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
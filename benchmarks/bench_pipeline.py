@@ -0,0 +1,185 @@
+""" End-to-end throughput benchmark of the main() stages against a local FPL stand-in.
+
+    Usage: python benchmarks/bench_pipeline.py --managers 100 10000 100000 [--latency-ms 20] [--error-rate 0.02]
+
+    For each league size a mock_fpl.py server is started in a subprocess and
+    every stage of main() is run on its own, reporting wall time, HTTP
+    requests served, rows written per second and peak RSS. Rows are written
+    to the database configured by the usual environment variables; point
+    DATABASE at a scratch copy of the fpl schema, never at production.
+    The fetcher honours FPL_CONCURRENCY and FPL_RATE_LIMIT as in production."""
+import os
+import sys
+import json
+import time
+import socket
+import contextlib
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+LEAGUE_ID = "1"
+
+
+class RssSampler:
+    """ Samples the resident set size in the background to find a stage's peak"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self.running = False
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def rss(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self.page_size
+        except OSError:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while self.running:
+            self.peak = max(self.peak, self.rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.rss()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, self.rss())
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, managers, latency_ms, error_rate):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mock_fpl.py"), "--port", str(port),
+         "--managers", str(managers), "--latency-ms", str(latency_ms), "--error-rate", str(error_rate)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    proc.stdout.readline()
+    return proc
+
+
+def served_requests(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/__stats") as response:
+        return json.load(response)["requests"]
+
+
+def rows_written(load_stats):
+    return sum(stats["rows"] for stats in load_stats.summary().values())
+
+
+def run_stages(port, pool):
+    """ Run each stage of main() in order and yield (stage, result dict)"""
+    import main
+    from db import load_stats, pooled_connection
+
+    ctx = {}
+
+    def bootstrap(conn):
+        ctx["snapshot"] = main.load_bootstrap()
+
+    def league_data(conn):
+        main.extract_league_data(LEAGUE_ID, conn)
+
+    def players_info(conn):
+        ctx["standings_index"] = main.stream_players_info(LEAGUE_ID, conn)
+
+    def fetch_histories(conn):
+        ctx["all_data"] = main.fetch_entry_histories(list(ctx["standings_index"]))
+
+    def save_gw(conn):
+        main.save_gw_data(LEAGUE_ID, ctx["all_data"], conn, ctx["standings_index"])
+
+    stages = [
+        ("bootstrap", bootstrap),
+        ("element_types", lambda conn: main.element_types(conn, ctx["snapshot"].element_types)),
+        ("extract_teams", lambda conn: main.extract_teams(conn, ctx["snapshot"].teams)),
+        ("extract_elements", lambda conn: main.extract_elements(conn, ctx["snapshot"].elements)),
+        ("player_gameweeks", lambda conn: main.extract_player_gameweeks(
+            conn, ctx["snapshot"].events, [p["id"] for p in ctx["snapshot"].elements])),
+        ("extract_league_data", league_data),
+        ("extract_players_info", players_info),
+        ("gw_fetch_histories", fetch_histories),
+        ("gw_save", save_gw),
+        ("manager_picks", lambda conn: main.extract_manager_picks(conn, list(ctx["standings_index"]))),
+    ]
+
+    with pooled_connection(pool) as conn:
+        for name, stage in stages:
+            requests_before = served_requests(port)
+            rows_before = rows_written(load_stats)
+            with RssSampler() as sampler:
+                start = time.perf_counter()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    stage(conn)
+                elapsed = time.perf_counter() - start
+            rows = rows_written(load_stats) - rows_before
+            yield name, {
+                "seconds": round(elapsed, 3),
+                "http_requests": served_requests(port) - requests_before,
+                "rows": rows,
+                "rows_per_sec": round(rows / elapsed) if rows and elapsed else 0,
+                "peak_rss_mb": round(sampler.peak / 2 ** 20, 1),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--managers", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Everything below must see the stand-in before the pipeline modules are imported
+    port = free_port()
+    os.environ["FPL_API_BASE"] = f"http://127.0.0.1:{port}/api"
+    os.environ["FPL_HTTP_CACHE"] = "off"
+    os.environ["FPL_CACHE_DIR"] = tempfile.mkdtemp(prefix="fpl-bench-")
+
+    from db import create_pool
+
+    results = {}
+    pool = create_pool()
+    try:
+        for managers in args.managers:
+            server = start_server(port, managers, args.latency_ms, args.error_rate)
+            try:
+                print(f"\n{managers} managers")
+                print(f"{'stage':<24}{'seconds':>10}{'requests':>10}{'rows':>10}{'rows/s':>10}{'peak MB':>10}")
+                results[managers] = {}
+                for name, result in run_stages(port, pool):
+                    results[managers][name] = result
+                    print(f"{name:<24}{result['seconds']:>10}{result['http_requests']:>10}"
+                          f"{result['rows']:>10}{result['rows_per_sec']:>10}{result['peak_rss_mb']:>10}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        pool.closeall()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+""" Compare the schema-driven transform against building row tuples one dict at a time.
+
+    Usage: python benchmarks/bench_transform.py [--players 700] [--gw-rows 100000] [--repeat 5]
+
+    Payloads come from mock_fpl.py, so no network or database is needed.
+    Each path is timed up to the buffer handed to COPY: per-dict tuples
+    rendered by loader._copy_buffer, and transform.to_batch rendered as CSV
+    by Arrow. The fastest of `--repeat` runs is reported."""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_fpl import element, history
+from loader import _copy_buffer, _csv_buffer, is_arrow
+from tables import ELEMENTS_DETAILS, ELEMENT_COLUMNS, GW_EVENTS
+from transform import to_batch
+
+GAMEWEEKS = 38
+
+
+def per_dict_elements(data):
+    return [tuple(player.get(col) for col in ELEMENT_COLUMNS) for player in data]
+
+
+def per_dict_gw(league_id, all_data, standings_index):
+    rows = []
+    for player_id, results in all_data.items():
+        ranks = standings_index.get(player_id, {})
+        for result in results:
+            rows.append((
+                result["event"], result["points"], result["total_points"], result["bank"],
+                result["event_transfers"], result["event_transfers_cost"],
+                result["points"] + result["event_transfers_cost"], result["points_on_bench"],
+                player_id, int(league_id), result["overall_rank"], result["value"],
+                ranks.get("rank"), ranks.get("last_rank"), ranks.get("rank_sort"),
+            ))
+    return rows
+
+
+def vectorized_gw(league_id, all_data, standings_index):
+    team_ids = [player_id for player_id, results in all_data.items() for _ in results]
+    ranks = [standings_index.get(player_id, {}) for player_id in team_ids]
+    return to_batch(GW_EVENTS, [result for results in all_data.values() for result in results], {
+        "team_id": team_ids,
+        "league_id": int(league_id),
+        "league_rank": [rank.get("rank") for rank in ranks],
+        "last_league_rank": [rank.get("last_rank") for rank in ranks],
+        "league_rank_sort": [rank.get("rank_sort") for rank in ranks],
+    })
+
+
+def copy_ready(transform):
+    """ Run a transform and render its output the way bulk_upsert would"""
+    def run(*args):
+        batch = transform(*args)
+        buf = _csv_buffer(batch) if is_arrow(batch) else _copy_buffer(batch)
+        return batch, buf
+    return run
+
+
+def best_of(repeat, func, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=700)
+    parser.add_argument("--gw-rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    players = [element(i) for i in range(1, args.players + 1)]
+    managers = -(-args.gw_rows // GAMEWEEKS)
+    all_data = {entry: history(entry, GAMEWEEKS)["current"] for entry in range(1, managers + 1)}
+    standings_index = {entry: {"rank": entry, "last_rank": entry, "rank_sort": entry} for entry in all_data}
+
+    cases = [
+        (f"{ELEMENTS_DETAILS.name} ({args.players} players)",
+         (per_dict_elements, players), (lambda data: to_batch(ELEMENTS_DETAILS, data), players)),
+        (f"{GW_EVENTS.name} ({managers * GAMEWEEKS} rows)",
+         (per_dict_gw, "1", all_data, standings_index), (vectorized_gw, "1", all_data, standings_index)),
+    ]
+
+    print(f"{'table':<36}{'stage':<12}{'per-dict s':>12}{'vectorized s':>14}{'speedup':>10}")
+    for name, (legacy, *legacy_args), (vectorized, *vectorized_args) in cases:
+        legacy_rows = legacy(*legacy_args)
+        batch = vectorized(*vectorized_args)
+        vectorized_rows = [tuple(row.values()) for row in batch.to_pylist()] if is_arrow(batch) else batch
+        assert legacy_rows == vectorized_rows, f"{name}: transforms disagree"
+
+        for label, wrap in (("transform", lambda f: f), ("+ COPY buf", copy_ready)):
+            legacy_seconds, _ = best_of(args.repeat, wrap(legacy), *legacy_args)
+            vectorized_seconds, _ = best_of(args.repeat, wrap(vectorized), *vectorized_args)
+            print(f"{name:<36}{label:<12}{legacy_seconds:>12.4f}{vectorized_seconds:>14.4f}"
+                  f"{legacy_seconds / vectorized_seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+""" Local stand-in for the FPL API serving deterministic synthetic payloads.
+
+    Usage: python benchmarks/mock_fpl.py --managers 10000 [--latency-ms 20] [--error-rate 0.05]
+
+    Serves bootstrap-static, fixtures, event live points, element summaries,
+    classic league standings (50 per page), entry histories and picks for
+    `--managers` managers in league 1. `--latency-ms` delays every
+    response and `--error-rate` answers that fraction of requests with a 429.
+    GET /__stats returns the number of requests served. The bound port is
+    printed on the first line of stdout."""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tables import ELEMENT_COLUMNS
+
+PAGE_SIZE = 50
+PLAYERS = 700
+TEAMS = 20
+
+TEXT_FIELDS = {"first_name", "second_name", "web_name", "news", "corners_and_indirect_freekicks_text",
+               "direct_freekicks_text", "penalties_text", "team_join_date", "birth_date"}
+DECIMAL_FIELDS = {"ep_next", "ep_this", "form", "points_per_game", "selected_by_percent", "value_form",
+                  "value_season", "influence", "creativity", "threat", "ict_index", "expected_goals",
+                  "expected_assists", "expected_goal_involvements", "expected_goals_conceded"}
+BOOL_FIELDS = {"in_dreamteam", "special", "has_temporary_code"}
+
+
+def element(i):
+    rng = random.Random(i)
+    player = {}
+    for col in ELEMENT_COLUMNS:
+        if col in TEXT_FIELDS:
+            player[col] = f"{col}-{i}" if "date" not in col else "1995-01-01"
+        elif col in DECIMAL_FIELDS:
+            player[col] = f"{rng.uniform(0, 10):.1f}"
+        elif col in BOOL_FIELDS:
+            player[col] = rng.random() < 0.1
+        elif col.endswith("_per_90"):
+            player[col] = round(rng.uniform(0, 1), 2)
+        else:
+            player[col] = rng.randint(0, 300)
+    player.update(id=i, code=100000 + i, team=1 + i % TEAMS, element_type=1 + i % 4)
+    return player
+
+
+def bootstrap(current_gw):
+    return {
+        "events": [
+            {"id": gw, "is_current": gw == current_gw, "finished": gw < current_gw,
+             "data_checked": gw < current_gw, "deadline_time": f"2024-{8 + gw // 5:02d}-01T10:00:00Z"}
+            for gw in range(1, 39)
+        ],
+        "element_types": [
+            {"id": i, "singular_name": name, "singular_name_short": name[:3].upper(), "element_count": 100}
+            for i, name in enumerate(["Goalkeeper", "Defender", "Midfielder", "Forward"], start=1)
+        ],
+        "teams": [
+            {"code": 100 + i, "id": i, "name": f"Team {i}", "short_name": f"T{i:02d}",
+             "strength": 3, "strength_overall_home": 1100, "strength_overall_away": 1150,
+             "strength_attack_home": 1100, "strength_attack_away": 1150,
+             "strength_defence_home": 1100, "strength_defence_away": 1150,
+             "win": 0, "draw": 0, "loss": 0, "played": 0}
+            for i in range(1, TEAMS + 1)
+        ],
+        "elements": [element(i) for i in range(1, PLAYERS + 1)],
+    }
+
+
+def history(entry, gameweeks):
+    rng = random.Random(entry)
+    total = 0
+    current = []
+    for gw in range(1, gameweeks + 1):
+        points = rng.randint(20, 90)
+        cost = rng.choice([0, 0, 0, 4])
+        total += points - cost
+        current.append({
+            "event": gw, "points": points, "total_points": total, "rank": rng.randint(1, 10_000_000),
+            "overall_rank": rng.randint(1, 10_000_000), "bank": rng.randint(0, 50),
+            "value": 1000 + gw, "event_transfers": cost // 4, "event_transfers_cost": cost,
+            "points_on_bench": rng.randint(0, 20),
+        })
+    return {"current": current, "past": [], "chips": []}
+
+
+STAT_FIELDS = ["minutes", "goals_scored", "assists", "clean_sheets", "goals_conceded", "own_goals",
+               "penalties_saved", "penalties_missed", "yellow_cards", "red_cards", "saves", "bonus",
+               "bps", "starts", "total_points"]
+DECIMAL_STATS = ["influence", "creativity", "threat", "ict_index", "expected_goals", "expected_assists",
+                 "expected_goal_involvements", "expected_goals_conceded"]
+
+
+def player_stats(element_id, gameweek):
+    rng = random.Random(element_id * 1000 + gameweek)
+    stats = {field: rng.randint(0, 10) for field in STAT_FIELDS}
+    stats.update({field: f"{rng.uniform(0, 5):.2f}" for field in DECIMAL_STATS})
+    stats["in_dreamteam"] = rng.random() < 0.02
+    return stats
+
+
+def event_live(gameweek):
+    return {"elements": [{"id": i, "stats": player_stats(i, gameweek), "explain": []}
+                         for i in range(1, PLAYERS + 1)]}
+
+
+def element_summary(element_id, gameweeks):
+    return {
+        "fixtures": [],
+        "history": [
+            dict(player_stats(element_id, gw), element=element_id, fixture=gw * 10 + element_id % 10,
+                 opponent_team=1 + (element_id + gw) % TEAMS, was_home=gw % 2 == 0,
+                 kickoff_time=f"2024-09-{gw % 28 + 1:02d}T14:00:00Z", team_h_score=1, team_a_score=0,
+                 round=gw, value=50, transfers_balance=0, selected=1000, transfers_in=10, transfers_out=5)
+            for gw in range(1, gameweeks + 1)
+        ],
+        "history_past": [],
+    }
+
+
+def picks(entry, gameweek):
+    """ A squad that changes by one transfer in roughly half the gameweeks"""
+    rng = random.Random(entry)
+    squad = rng.sample(range(1, PLAYERS + 1), 15)
+    for _ in range(2, gameweek + 1):
+        if rng.random() < 0.5:
+            incoming = rng.choice([i for i in range(1, PLAYERS + 1) if i not in squad])
+            squad[rng.randrange(15)] = incoming
+    lineup = random.Random(entry * 1000 + gameweek).sample(squad, 15)
+    return {
+        "active_chip": None,
+        "automatic_subs": [],
+        "picks": [{"element": element, "position": position, "multiplier": 2 if position == 1 else int(position <= 11),
+                   "is_captain": position == 1, "is_vice_captain": position == 2}
+                  for position, element in enumerate(lineup, start=1)],
+    }
+
+
+def fixtures(gameweek, current_gw):
+    return [
+        {"id": gameweek * 10 + i, "event": gameweek, "team_h": 2 * i + 1, "team_a": 2 * i + 2,
+         "kickoff_time": f"2024-{8 + gameweek // 5:02d}-02T14:00:00Z",
+         "started": gameweek <= current_gw, "finished": gameweek < current_gw,
+         "finished_provisional": gameweek <= current_gw}
+        for i in range(TEAMS // 2)
+    ]
+
+
+def standings(league_id, page, managers):
+    start = (page - 1) * PAGE_SIZE
+    entries = range(start + 1, min(start + PAGE_SIZE, managers) + 1)
+    return {
+        "league": {"id": league_id, "name": f"Benchmark league {league_id}", "created": "2024-07-01T00:00:00Z"},
+        "standings": {
+            "has_next": start + PAGE_SIZE < managers,
+            "page": page,
+            "results": [
+                {"id": entry, "entry": entry, "entry_name": f"Team {entry}", "player_name": f"Manager {entry}",
+                 "event_total": 50, "total": 1000, "rank": entry, "last_rank": entry, "rank_sort": entry}
+                for entry in entries
+            ],
+        },
+    }
+
+
+def make_handler(managers, gameweeks, latency, error_rate):
+    lock = threading.Lock()
+    counter = {"requests": 0}
+    bootstrap_body = json.dumps(bootstrap(gameweeks)).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            if parts == ["__stats"]:
+                return self._send(200, json.dumps(counter).encode())
+
+            with lock:
+                counter["requests"] += 1
+            if latency:
+                time.sleep(latency)
+            if error_rate and random.random() < error_rate:
+                return self._send(429, headers={"Retry-After": "0"})
+
+            # Paths look like /api/<endpoint>/...
+            parts = parts[1:] if parts and parts[0] == "api" else parts
+            if parts == ["bootstrap-static"]:
+                return self._send(200, bootstrap_body)
+            if len(parts) == 3 and parts[0] == "leagues-classic" and parts[2] == "standings":
+                page = int(parse_qs(url.query).get("page_standings", ["1"])[0])
+                return self._send(200, json.dumps(standings(int(parts[1]), page, managers)).encode())
+            if len(parts) == 3 and parts[0] == "entry" and parts[2] == "history":
+                entry = int(parts[1])
+                if 1 <= entry <= managers:
+                    return self._send(200, json.dumps(history(entry, gameweeks)).encode())
+            if len(parts) == 5 and parts[0] == "entry" and parts[2] == "event" and parts[4] == "picks":
+                entry = int(parts[1])
+                if 1 <= entry <= managers:
+                    return self._send(200, json.dumps(picks(entry, int(parts[3]))).encode())
+            if parts == ["fixtures"]:
+                event = int(parse_qs(url.query).get("event", ["1"])[0])
+                return self._send(200, json.dumps(fixtures(event, gameweeks)).encode())
+            if len(parts) == 3 and parts[0] == "event" and parts[2] == "live":
+                return self._send(200, json.dumps(event_live(int(parts[1]))).encode())
+            if len(parts) == 2 and parts[0] == "element-summary":
+                return self._send(200, json.dumps(element_summary(int(parts[1]), gameweeks)).encode())
+            self._send(404, b'{"detail": "Not found."}')
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(managers, gameweeks=38, latency_ms=0, error_rate=0.0, port=0):
+    """ Start the stand-in server on a background thread and return it"""
+    handler = make_handler(managers, gameweeks, latency_ms / 1000, error_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--managers", type=int, default=100)
+    parser.add_argument("--gameweeks", type=int, default=38)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    server = serve(args.managers, args.gameweeks, args.latency_ms, args.error_rate, args.port)
+    print(server.server_address[1], flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import json
+import logging
+
+from api import BOOTSTRAP_URL
+from fetcher import ConcurrentFetcher
+from http_cache import CACHE_DIR, get_cache
+from metrics import decode_json
+
+logger = logging.getLogger(__name__)
+
+
+class BootstrapSnapshot:
+    """ A single decoded bootstrap-static payload shared by the loaders"""
+
+    def __init__(self, data, etag=None, last_modified=None, not_modified=False):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        # True when the server answered 304 and the body came from disk
+        self.not_modified = not_modified
+
+    @property
+    def element_types(self) -> list[dict]:
+        return self.data.get("element_types", [])
+
+    @property
+    def teams(self) -> list[dict]:
+        return self.data.get("teams", [])
+
+    @property
+    def elements(self) -> list[dict]:
+        return self.data.get("elements", [])
+
+    @property
+    def events(self) -> list[dict]:
+        return self.data.get("events", [])
+
+
+def _snapshot_paths(cache_dir):
+    body_path = os.path.join(cache_dir, "bootstrap-static.json")
+    meta_path = os.path.join(cache_dir, "bootstrap-static.meta.json")
+    return body_path, meta_path
+
+
+def _read_cached_snapshot(cache_dir):
+    """ Returns (data, meta) of the last snapshot on disk, or (None, {})"""
+    body_path, meta_path = _snapshot_paths(cache_dir)
+    try:
+        with open(body_path, "r") as f:
+            data = json.load(f)
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        return data, meta
+    except (OSError, ValueError):
+        return None, {}
+
+
+def _write_cached_snapshot(cache_dir, body, meta):
+    """ Persist the raw body and its validators, replacing the previous snapshot"""
+    body_path, meta_path = _snapshot_paths(cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(body_path + ".tmp", "wb") as f:
+            f.write(body)
+        os.replace(body_path + ".tmp", body_path)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+    except OSError as e:
+        logger.warning(f"Could not cache bootstrap snapshot: {e}")
+
+
+def load_bootstrap(cache_dir=CACHE_DIR, fetcher=None):
+    """ Download and decode bootstrap-static once per run.
+
+        The last snapshot is kept on disk with its ETag/Last-Modified headers
+        and sent back as a conditional request, so an unchanged payload is
+        answered with 304 and read from disk instead of downloaded again.
+        Within the response cache TTL no request is made at all. The request
+        goes through `fetcher`, which times out and retries 429/5xx."""
+    response_cache = get_cache()
+    if response_cache is not None:
+        body = response_cache.get(BOOTSTRAP_URL)
+        if body is not None:
+            return BootstrapSnapshot(decode_json(body), not_modified=True)
+
+    cached, meta = _read_cached_snapshot(cache_dir)
+
+    headers = {}
+    if cached is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    own_fetcher = fetcher is None
+    fetcher = fetcher or ConcurrentFetcher(max_workers=1)
+    try:
+        response = fetcher.get(BOOTSTRAP_URL, headers=headers)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+    if response.status_code == 304 and cached is not None:
+        logger.info("bootstrap-static not modified, using cached snapshot")
+        if response_cache is not None:
+            response_cache.put(BOOTSTRAP_URL, json.dumps(cached).encode())
+        return BootstrapSnapshot(cached, meta.get("etag"), meta.get("last_modified"), not_modified=True)
+
+    data = decode_json(response.content)
+
+    meta = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    _write_cached_snapshot(cache_dir, response.content, meta)
+    if response_cache is not None:
+        response_cache.put(BOOTSTRAP_URL, response.content)
+    logger.info(f"bootstrap-static downloaded ({len(response.content)} bytes)")
+
+    return BootstrapSnapshot(data, meta["etag"], meta["last_modified"])
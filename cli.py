@@ -0,0 +1,111 @@
+""" Command-line entry point for the FPL pipeline.
+
+    Usage: python cli.py [--leagues 1,2] [--full-sync] [--dry-run] COMMAND
+
+    Commands:
+        run         every stage, as main.py does (--skip drops stages)
+        bootstrap   element types, teams and players from bootstrap-static
+        players     per-gameweek player stats (--live for live points only)
+        standings   league details and standings
+        histories   standings and manager gameweek histories
+        picks       manager picks of league members already in fpl.gw_events
+        watch       keep the tables fresh on the gameweek schedule
+
+    Pipeline modules (requests, psycopg2, pyarrow) are imported only once a
+    command runs, so --help and --dry-run return immediately and do no I/O.
+    --dry-run prints the stages, leagues and database a command would use."""
+import os
+import sys
+import logging
+import argparse
+
+from stages import STAGES, env_flag
+
+logger = logging.getLogger(__name__)
+
+COMMANDS = {
+    "bootstrap": ("bootstrap",),
+    "players": ("players",),
+    "standings": ("standings",),
+    "histories": ("histories",),
+    "picks": ("picks",),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description=__doc__.splitlines()[0])
+    parser.add_argument("--leagues", help="comma separated league ids (default: LEAGUE_IDS)")
+    parser.add_argument("--full-sync", action="store_true", help="fetch every manager, not only changed ones")
+    parser.add_argument("--dry-run", action="store_true", help="print what would run and exit")
+    parser.add_argument("--log-level", default="INFO")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run every stage")
+    run.add_argument("--skip", default="", help=f"comma separated stages to skip: {', '.join(STAGES)}")
+    run.add_argument("--live", action="store_true", help="light pass used while matches are in play")
+    for command in COMMANDS:
+        sub = commands.add_parser(command, help=f"run the {command} stage")
+        if command == "players":
+            sub.add_argument("--live", action="store_true", help="live points only, no element summaries")
+    commands.add_parser("watch", help="poll on the gameweek schedule until interrupted")
+
+    args = parser.parse_args(argv)
+    skip = [name.strip() for name in getattr(args, "skip", "").split(",") if name.strip()]
+    unknown = set(skip) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    args.stages = tuple(s for s in STAGES if s not in skip) if args.command == "run" else COMMANDS.get(args.command)
+    return args
+
+
+def _split_leagues(raw):
+    return [league_id.strip() for league_id in (raw or "").split(",") if league_id.strip()]
+
+
+def describe(args, league_ids, incremental):
+    """ The plan printed by --dry-run"""
+    stages = ", ".join(args.stages) if args.stages else "all, on the gameweek schedule"
+    database = f"{os.getenv('DATABASE')} on {os.getenv('HOST', 'localhost')}:{os.getenv('PORT', 5432)}"
+    sync = "incremental" if incremental else "full"
+    return "\n".join([
+        f"command:  {args.command}{' (live)' if getattr(args, 'live', False) else ''}",
+        f"stages:   {stages}",
+        f"leagues:  {', '.join(league_ids) or 'none'}",
+        f"sync:     {sync}",
+        f"database: {database}",
+    ])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Load .env before the pipeline modules, some read their settings at import
+    from dotenv import load_dotenv
+    load_dotenv()
+    league_ids = _split_leagues(args.leagues or os.getenv("LEAGUE_IDS") or os.getenv("LEAGUE_ID"))
+    incremental = env_flag("INCREMENTAL_SYNC") and not args.full_sync
+
+    if args.dry_run:
+        print(describe(args, league_ids, incremental))
+        return 0
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.command == "watch":
+        from watch import watch
+        watch(league_ids=league_ids, incremental=incremental)
+        return 0
+
+    from main import close_run, run_pipeline
+    from db import create_pool
+
+    pool = create_pool()
+    try:
+        run_pipeline(pool, league_ids, incremental=incremental, picks=env_flag("MANAGER_PICKS"),
+                     live=getattr(args, "live", False), stages=args.stages)
+    finally:
+        close_run(pool)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.errors import TransactionRollbackError
+from psycopg2.pool import ThreadedConnectionPool
+
+from loader import Merged, ensure_hash_column, is_arrow, upsert_table
+from metrics import record_db
+
+logger = logging.getLogger(__name__)
+
+
+def connection_params():
+    """ Postgres connection settings read from the environment"""
+    return dict(
+        host=os.getenv('HOST', 'localhost'),   # fallback to localhost
+        port=os.getenv('PORT', 5432),
+        database=os.getenv('DATABASE'),
+        user=os.getenv('USERNAME'),
+        password=os.getenv('PASSWORD')
+    )
+
+
+def create_pool(minconn=1, maxconn=None):
+    """ Thread-safe connection pool shared by concurrent loaders"""
+    maxconn = int(maxconn or os.getenv("DB_POOL_SIZE", 8))
+    return ThreadedConnectionPool(minconn, maxconn, **connection_params())
+
+
+@contextmanager
+def pooled_connection(pool):
+    """ Borrow a connection from the pool and always hand it back"""
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        # A connection lost with the server is closed already; putconn discards it
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+class LoadStats:
+    """ Rows inserted, updated, skipped and rejected and time spent per table across a run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+
+    def record(self, table, merged, failed, seconds):
+        with self.lock:
+            stats = self.tables.setdefault(table, {"rows": 0, "inserted": 0, "updated": 0, "skipped": 0,
+                                                   "failed": 0, "seconds": 0.0})
+            stats["rows"] += merged.inserted + merged.updated
+            stats["inserted"] += merged.inserted
+            stats["updated"] += merged.updated
+            stats["skipped"] += merged.skipped
+            stats["failed"] += failed
+            stats["seconds"] += seconds
+
+    def summary(self):
+        with self.lock:
+            return {
+                table: dict(stats, rows_per_sec=round(stats["rows"] / stats["seconds"]) if stats["seconds"] else 0)
+                for table, stats in self.tables.items()
+            }
+
+    def log(self):
+        for table, stats in self.summary().items():
+            logger.info(f"{table}: {stats['rows']} rows in {stats['seconds']:.2f}s "
+                        f"({stats['rows_per_sec']} rows/sec, {stats['inserted']} inserted, "
+                        f"{stats['updated']} updated, {stats['skipped']} skipped, {stats['failed']} rejected)")
+
+
+load_stats = LoadStats()
+
+
+def _row_key(table, row):
+    """ Conflict-column values of one row, a tuple or a dict from Arrow"""
+    if isinstance(row, dict):
+        return tuple(row[col] for col in table.conflict_columns)
+    return tuple(row[table.columns.index(col)] for col in table.conflict_columns)
+
+
+def _write_batch(conn, table, batch, retries):
+    """ Write one batch under a savepoint; returns (Merged, keys of rejected rows).
+
+        Serialization failures and deadlocks are retried as they are. A data or
+        integrity error rolls back to the savepoint and the batch is split in
+        half until the offending rows are isolated, so one bad row only loses
+        itself. Any other error, such as a missing column, is raised at once."""
+    cursor = conn.cursor()
+    for attempt in range(retries + 1):
+        cursor.execute("SAVEPOINT fpl_batch")
+        try:
+            merged = upsert_table(conn, table, batch)
+            cursor.execute("RELEASE SAVEPOINT fpl_batch")
+            return merged, []
+        except TransactionRollbackError as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT fpl_batch")
+            if attempt < retries:
+                logger.warning(f"Retrying {table.name} batch of {len(batch)} rows ({attempt + 1}/{retries}): {e}")
+            else:
+                logger.error(f"Giving up on {table.name} batch of {len(batch)} rows after {retries} retries: {e}")
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT fpl_batch")
+            if len(batch) == 1:
+                row = batch.to_pylist()[0] if is_arrow(batch) else batch[0]
+                logger.error(f"Rejected row {row!r} for {table.name}: {e}")
+                return Merged(0, 0, 0), [_row_key(table, row)]
+            break
+    else:
+        rows = batch.to_pylist() if is_arrow(batch) else batch
+        return Merged(0, 0, 0), [_row_key(table, row) for row in rows]
+
+    middle = len(batch) // 2
+    left = _write_batch(conn, table, batch[:middle], retries)
+    right = _write_batch(conn, table, batch[middle:], retries)
+    return Merged(*map(sum, zip(left[0], right[0]))), left[1] + right[1]
+
+
+def batched_upsert(conn, table, rows, batch_size=None, retries=2):
+    """ Upsert rows into a tables.py table, committing every `batch_size` rows.
+
+        Each batch is isolated by a savepoint so a failing batch is retried or
+        narrowed down to its bad rows instead of discarding the whole load.
+        `rows` is a list of tuples or a batch from transform.to_batch.
+        Returns the conflict-column values of the rows that were rejected,
+        so callers can keep them out of any high-water mark."""
+    batch_size = int(batch_size or os.getenv("DB_BATCH_SIZE", 5000))
+    rows = rows if is_arrow(rows) else list(rows)
+    merged = Merged(0, 0, 0)
+    rejected = []
+    start = time.perf_counter()
+    if table.hash_column and len(rows):
+        ensure_hash_column(conn, table.name, table.hash_column)
+
+    for offset in range(0, len(rows), batch_size):
+        execute_start = time.perf_counter()
+        batch_merged, batch_rejected = _write_batch(conn, table, rows[offset:offset + batch_size], retries)
+        commit_start = time.perf_counter()
+        conn.commit()
+        record_db(commit_start - execute_start, time.perf_counter() - commit_start,
+                  batch_merged.inserted + batch_merged.updated)
+        merged = Merged(*map(sum, zip(merged, batch_merged)))
+        rejected.extend(batch_rejected)
+
+    load_stats.record(table.name, merged, len(rejected), time.perf_counter() - start)
+    if rejected:
+        logger.warning(f"{len(rejected)} of {len(rows)} rows rejected for {table.name}")
+    return rejected
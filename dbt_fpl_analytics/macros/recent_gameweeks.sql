@@ -0,0 +1,9 @@
+{#
+    Filter for incremental runs. The live gameweek changes until FPL confirms
+    it, so the last `lookback` + 1 gameweeks already loaded are rebuilt, along
+    with every row of a league the model has not seen yet.
+#}
+{% macro recent_gameweeks(lookback=1) %}
+    game_week >= (select coalesce(max(game_week), 0) - {{ lookback }} from {{ this }})
+    or league_id not in (select distinct league_id from {{ this }})
+{% endmacro %}
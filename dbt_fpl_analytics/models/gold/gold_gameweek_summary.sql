@@ -0,0 +1,27 @@
+{{
+    config(
+        unique_key=['game_week', 'league_id'],
+        indexes=[
+            {'columns': ['game_week', 'league_id'], 'unique': True},
+        ]
+    )
+}}
+
+-- Per-gameweek aggregates over every manager in a league
+select
+    game_week,
+    league_id,
+    count(*) as managers,
+    round(avg(weeks_points), 2) as avg_points,
+    max(weeks_points) as max_points,
+    min(weeks_points) as min_points,
+    percentile_cont(0.5) within group (order by weeks_points) as median_points,
+    round(avg(bench_points), 2) as avg_bench_points,
+    sum(transfers) as transfers,
+    count(*) filter (where transfer_cost > 0) as managers_taking_hits,
+    sum(transfer_cost) as hit_cost
+from {{ ref('silver_gw_events') }}
+{% if is_incremental() %}
+where {{ recent_gameweeks() }}
+{% endif %}
+group by game_week, league_id
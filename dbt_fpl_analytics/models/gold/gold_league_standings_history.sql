@@ -0,0 +1,28 @@
+{{
+    config(
+        unique_key=['game_week', 'team_id', 'league_id'],
+        indexes=[
+            {'columns': ['game_week', 'team_id', 'league_id'], 'unique': True},
+            {'columns': ['league_id', 'game_week']},
+            {'columns': ['league_id', 'team_id']},
+        ]
+    )
+}}
+
+-- fpl.gw_events carries each manager's current league rank on every row,
+-- so the rank at each gameweek is rebuilt from the running totals
+select
+    game_week,
+    team_id,
+    league_id,
+    manager_name,
+    team_name,
+    weeks_points,
+    total_points,
+    rank() over (partition by league_id, game_week order by total_points desc) as league_rank,
+    rank() over (partition by league_id, game_week order by weeks_points desc) as gameweek_rank,
+    overall_rank
+from {{ ref('silver_gw_events') }}
+{% if is_incremental() %}
+where {{ recent_gameweeks() }}
+{% endif %}
@@ -0,0 +1,41 @@
+{{
+    config(
+        unique_key=['game_week', 'team_id', 'league_id'],
+        indexes=[
+            {'columns': ['game_week', 'team_id', 'league_id'], 'unique': True},
+            {'columns': ['league_id', 'game_week']},
+        ]
+    )
+}}
+
+with standings as (
+    select *
+    from {{ ref('gold_league_standings_history') }}
+    {% if is_incremental() %}
+    -- One more gameweek than is rebuilt, for the previous rank
+    where {{ recent_gameweeks(lookback=2) }}
+    {% endif %}
+),
+
+movement as (
+    select
+        game_week,
+        team_id,
+        league_id,
+        manager_name,
+        league_rank,
+        lag(league_rank) over season as previous_league_rank,
+        overall_rank,
+        lag(overall_rank) over season as previous_overall_rank
+    from standings
+    window season as (partition by league_id, team_id order by game_week)
+)
+
+select
+    *,
+    previous_league_rank - league_rank as league_rank_change,
+    previous_overall_rank - overall_rank as overall_rank_change
+from movement
+{% if is_incremental() %}
+where {{ recent_gameweeks() }}
+{% endif %}
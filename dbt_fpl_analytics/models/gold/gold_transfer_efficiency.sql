@@ -0,0 +1,39 @@
+{{
+    config(
+        unique_key=['game_week', 'team_id', 'league_id'],
+        indexes=[
+            {'columns': ['game_week', 'team_id', 'league_id'], 'unique': True},
+            {'columns': ['league_id', 'team_id']},
+        ]
+    )
+}}
+
+-- Season running totals need every gameweek of a manager, so the window runs
+-- over the whole of silver and only the rows being rebuilt are kept
+with season as (
+    select
+        game_week,
+        team_id,
+        league_id,
+        transfers,
+        transfer_cost,
+        gross_points,
+        weeks_points,
+        round(weeks_points - avg(weeks_points) over gameweek, 2) as points_vs_league_avg,
+        sum(transfers) over running as season_transfers,
+        sum(transfer_cost) over running as season_hit_cost,
+        sum(gross_points) over running as season_gross_points
+    from {{ ref('silver_gw_events') }}
+    window
+        gameweek as (partition by league_id, game_week),
+        running as (partition by league_id, team_id order by game_week)
+)
+
+select
+    *,
+    transfer_cost > 0 as took_hit,
+    round(100.0 * season_hit_cost / nullif(season_gross_points, 0), 2) as season_hit_cost_pct
+from season
+{% if is_incremental() %}
+where {{ recent_gameweeks() }}
+{% endif %}
@@ -0,0 +1,36 @@
+{{
+    config(
+        unique_key=['game_week', 'team_id', 'league_id'],
+        indexes=[
+            {'columns': ['game_week', 'team_id', 'league_id'], 'unique': True},
+            {'columns': ['league_id', 'team_id']},
+        ]
+    )
+}}
+
+with gw_events as (
+    select *
+    from {{ ref('bronze_gw_events') }}
+    {% if is_incremental() %}
+    where {{ recent_gameweeks() }}
+    {% endif %}
+)
+
+select
+    g.game_week,
+    g.team_id,
+    g.league_id,
+    p.player_name as manager_name,
+    p.team_name,
+    g.weeks_points,
+    g.gross_points,
+    g.bench_points,
+    g.transfers,
+    g.transfer_cost,
+    g.total_points,
+    g.overall_rank,
+    g.bank / 10.0 as bank,
+    g.team_value / 10.0 as team_value
+from gw_events g
+left join {{ ref('bronze_player_details') }} p
+    on p.team_id = g.team_id
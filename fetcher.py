@@ -0,0 +1,223 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api import ENTRY_HISTORY_URL
+from http_cache import get_cache
+from metrics import StageExecutor, decode_json, record_http
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """ Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchStats:
+    """ Per-request timings and counters collected by a fetcher"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    def record(self, elapsed, retried=False, failed=False):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(elapsed)
+            if retried:
+                self.retries += 1
+            if failed:
+                self.errors += 1
+
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {"requests": 0, "retries": 0, "errors": 0}
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "mean_ms": round(1000 * sum(latencies) / len(latencies), 1),
+            "p50_ms": round(1000 * pct(0.50), 1),
+            "p95_ms": round(1000 * pct(0.95), 1),
+            "max_ms": round(1000 * latencies[-1], 1),
+        }
+
+
+class ConcurrentFetcher:
+    """ Bounded-parallelism JSON fetcher over a pooled requests.Session"""
+
+    def __init__(self, max_workers=None, rate=None, timeout=10, max_retries=5, backoff=0.5):
+        self.max_workers = int(max_workers or os.getenv("FPL_CONCURRENCY", 8))
+        self.rate = float(rate or os.getenv("FPL_RATE_LIMIT", 10))
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(self.rate)
+        self.stats = FetchStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            # Full jitter exponential backoff
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+        time.sleep(delay)
+
+    def get(self, url, headers=None):
+        """ GET a URL, retrying 429/5xx and connection errors, and return the response.
+
+            HTTP errors left once the retries run out are raised."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException:
+                elapsed = time.perf_counter() - start
+                self.stats.record(elapsed, retried=attempt > 0, failed=True)
+                record_http(elapsed, 0)
+                if attempt == self.max_retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+
+            elapsed = time.perf_counter() - start
+            self.stats.record(elapsed, retried=attempt > 0, failed=response.status_code >= 400)
+            record_http(elapsed, len(response.content))
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                self._sleep_before_retry(attempt, response)
+                continue
+
+            response.raise_for_status()
+            return response
+
+    def get_json(self, url):
+        """ GET a URL and decode JSON, retrying 429/5xx and connection errors.
+
+            Responses are served from and stored in the response cache."""
+        cache = get_cache()
+        if cache is not None:
+            body = cache.get(url)
+            if body is not None:
+                return decode_json(body)
+
+        response = self.get(url)
+        if cache is not None:
+            cache.put(url, response.content)
+        return decode_json(response.content)
+
+    def fetch_all(self, keys, url_for, on_result=None):
+        """ Fetch url_for(key) for every key concurrently.
+
+            Returns {key: payload} in the order of `keys`; keys that fail are
+            logged and left out. `on_result(key, payload)` runs as each one lands."""
+        results = {}
+        with StageExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.get_json, url_for(key)): key for key in keys}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    payload = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching {url_for(key)}: {e}")
+                    continue
+                results[key] = payload
+                if on_result is not None:
+                    on_result(key, payload)
+
+        return {key: results[key] for key in keys if key in results}
+
+    def close(self):
+        self.session.close()
+
+
+def fetch_entry_histories(player_ids, fetcher=None, manifest=None):
+    """ Fetch /entry/{id}/history for every manager and return {id: current}.
+
+        With a RunManifest, histories it already holds are not fetched again
+        and every new payload is written through to it as it arrives."""
+    resumed = manifest.load_histories(player_ids) if manifest is not None else {}
+    missing = [player for player in player_ids if int(player) not in resumed]
+    if resumed:
+        logger.info(f"{len(resumed)} manager histories restored from the run manifest, {len(missing)} to fetch")
+
+    own_fetcher = fetcher is None
+    fetcher = fetcher or ConcurrentFetcher()
+    total_players = len(missing)
+    done = 0
+    lock = threading.Lock()
+
+    def progress(player, payload):
+        nonlocal done
+        with lock:
+            done += 1
+            # Display progress in console
+            print(f"[{done}/{total_players}] Fetched GW data for player {player}")
+        if manifest is not None:
+            manifest.save_history(player, payload)
+
+    try:
+        fetched = fetcher.fetch_all(
+            missing,
+            lambda player: ENTRY_HISTORY_URL.format(entry_id=player),
+            on_result=progress,
+        )
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+    all_data = {}
+    for player in player_ids:
+        payload = resumed.get(int(player)) or fetched.get(player)
+        if payload is None:
+            continue
+        data = payload.get("current")
+        if not data:
+            logger.warning(f"No data found for player {player}")
+            continue
+        all_data[player] = data
+
+    logger.info(f"Entry history fetch stats: {fetcher.stats.summary()}")
+    return all_data
@@ -0,0 +1,201 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FPL_CACHE_DIR", ".fpl_cache")
+
+FOREVER = 365 * 24 * 3600
+
+# Seconds a response stays fresh, per endpoint class (see ttl_for)
+BOOTSTRAP_TTL = int(os.getenv("FPL_TTL_BOOTSTRAP", 300))
+STANDINGS_TTL = int(os.getenv("FPL_TTL_STANDINGS", 30))
+LIVE_HISTORY_TTL = int(os.getenv("FPL_TTL_HISTORY", 120))
+LIVE_EVENT_TTL = int(os.getenv("FPL_TTL_LIVE", 30))
+ELEMENT_SUMMARY_TTL = int(os.getenv("FPL_TTL_ELEMENT_SUMMARY", 300))
+DEFAULT_TTL = int(os.getenv("FPL_TTL_DEFAULT", 60))
+
+# Current gameweek as (event id, finished); set once bootstrap-static is loaded
+_gameweek = (None, False)
+
+
+def set_gameweek(event_id, finished):
+    """ Tell the cache which gameweek is current so history TTLs can be chosen"""
+    global _gameweek
+    _gameweek = (event_id, finished)
+
+
+def cache_key(url):
+    """ Entry histories are keyed by gameweek so a new gameweek starts a fresh entry"""
+    event_id, _ = _gameweek
+    if "/history" in url and event_id is not None:
+        return f"{url}#gw={event_id}"
+    return url
+
+
+def ttl_for(url):
+    """ Freshness lifetime for an FPL endpoint"""
+    if "bootstrap-static" in url:
+        return BOOTSTRAP_TTL
+    if "/standings/" in url:
+        return STANDINGS_TTL
+    if "/history" in url:
+        # Once the current gameweek has finished a manager's history is final
+        # until the next one starts, and the key changes when it does
+        _, finished = _gameweek
+        return FOREVER if finished else LIVE_HISTORY_TTL
+    if url.rstrip("/").endswith("/picks"):
+        # Picks lock at the deadline, and a gameweek is only fetched after it
+        return FOREVER
+    if "/event/" in url and url.rstrip("/").endswith("/live"):
+        # Live points of a past gameweek no longer change
+        event_id, finished = _gameweek
+        gameweek = int(url.rstrip("/").split("/")[-2])
+        if event_id is not None and (gameweek < event_id or (gameweek == event_id and finished)):
+            return FOREVER
+        return LIVE_EVENT_TTL
+    if "/element-summary/" in url:
+        return ELEMENT_SUMMARY_TTL
+    return DEFAULT_TTL
+
+
+class ResponseCache:
+    """ SQLite-backed store of raw response bodies keyed by URL.
+
+        Each entry's expiry is fixed by ttl_for(url) when it is stored, and an
+        entry stored before its endpoint became final is never served once it
+        is, so a body fetched while the gameweek was live cannot pass for the
+        final one. The least recently used entries are evicted once the file
+        grows past `max_bytes`. In offline mode TTLs are ignored and a miss
+        raises, so recorded fixtures can be replayed."""
+
+    def __init__(self, path, max_bytes, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._db()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                expires_at REAL,
+                final INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        columns = {row[1] for row in db.execute("PRAGMA table_info(responses)")}
+        # Entries from before expiries were stored have none and read as stale
+        if "expires_at" not in columns:
+            db.execute("ALTER TABLE responses ADD COLUMN expires_at REAL")
+        if "final" not in columns:
+            db.execute("ALTER TABLE responses ADD COLUMN final INTEGER NOT NULL DEFAULT 0")
+        db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        db.commit()
+        self.total_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _db(self):
+        # sqlite3 connections cannot be shared across threads
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self.local.db = db
+        return db
+
+    def get(self, url):
+        """ Returns the cached body for a URL, or None when missing or stale"""
+        key = cache_key(url)
+        db = self._db()
+        row = db.execute("SELECT body, expires_at, final FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+
+        if row is None or (not self.offline and self._stale(url, row[1], row[2], now)):
+            with self.lock:
+                self.misses += 1
+            if self.offline:
+                raise LookupError(f"Offline and no recorded response for {url}")
+            return None
+
+        with self.lock:
+            self.hits += 1
+            db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+        return row[0]
+
+    @staticmethod
+    def _stale(url, expires_at, final, now):
+        if expires_at is None or now > expires_at:
+            return True
+        # Stored while live: the endpoint has since become final, so refetch it
+        return not final and ttl_for(url) == FOREVER
+
+    def put(self, url, body):
+        key = cache_key(url)
+        now = time.time()
+        ttl = ttl_for(url)
+        db = self._db()
+        with self.lock:
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute("""
+                INSERT OR REPLACE INTO responses (key, body, size, fetched_at, accessed_at, expires_at, final)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (key, body, len(body), now, now, now + ttl, int(ttl == FOREVER)))
+            db.commit()
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict(db)
+
+    def _evict(self, db):
+        """ Drop least recently used entries until the cache is under 90% of its budget"""
+        target = int(self.max_bytes * 0.9)
+        rows = db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.total_bytes -= size
+            self.evictions += 1
+        db.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self.total_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """ The process-wide response cache, or None when FPL_HTTP_CACHE=off"""
+    global _cache
+    setting = os.getenv("FPL_HTTP_CACHE", os.path.join(CACHE_DIR, "http.sqlite"))
+    if setting.lower() in ("off", "0", "false", ""):
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            max_bytes = int(float(os.getenv("FPL_HTTP_CACHE_MAX_MB", 512)) * 1024 * 1024)
+            offline = os.getenv("FPL_OFFLINE", "").lower() in ("1", "true", "yes")
+            _cache = ResponseCache(setting, max_bytes, offline=offline)
+        return _cache
+
@@ -0,0 +1,209 @@
+import os
+import time
+import logging
+import threading
+
+from sync_state import current_event
+from tables import ELEMENT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Rows held per dataset/partition before a Parquet part file is written
+FLUSH_ROWS = int(os.getenv("LANDING_FLUSH_ROWS", 50000))
+
+# Element fields FPL sends as text, decimals sent as strings, and flags
+ELEMENT_TEXT = {"first_name", "second_name", "web_name", "team_join_date", "birth_date",
+                "corners_and_indirect_freekicks_text", "direct_freekicks_text", "penalties_text",
+                "ep_next", "ep_this", "form", "points_per_game", "selected_by_percent", "value_form",
+                "value_season", "influence", "creativity", "threat", "ict_index", "expected_goals",
+                "expected_assists", "expected_goal_involvements", "expected_goals_conceded"}
+ELEMENT_BOOL = {"in_dreamteam", "special", "has_temporary_code"}
+
+
+def _element_type(column):
+    if column in ELEMENT_TEXT:
+        return "string"
+    if column in ELEMENT_BOOL:
+        return "bool_"
+    return "float64" if column.endswith("_per_90") else "int64"
+
+
+# Arrow type of every landed field, per dataset. Each part file is written
+# with its dataset's schema, so a column that is all null in one part does
+# not get the null type and the parts read back as one dataset. Fields
+# missing from a payload land as null; fields not listed are not landed.
+SCHEMAS = {
+    "elements": [(column, _element_type(column)) for column in ELEMENT_COLUMNS],
+    "teams": [
+        ("id", "int64"), ("code", "int64"), ("name", "string"), ("short_name", "string"),
+        ("strength", "int64"), ("strength_overall_home", "int64"), ("strength_overall_away", "int64"),
+        ("strength_attack_home", "int64"), ("strength_attack_away", "int64"),
+        ("strength_defence_home", "int64"), ("strength_defence_away", "int64"),
+        ("played", "int64"), ("win", "int64"), ("draw", "int64"), ("loss", "int64"),
+        ("points", "int64"), ("position", "int64"), ("form", "string"), ("unavailable", "bool_"),
+        ("pulse_id", "int64"),
+    ],
+    "standings": [
+        ("id", "int64"), ("entry", "int64"), ("entry_name", "string"), ("player_name", "string"),
+        ("event_total", "int64"), ("total", "int64"), ("rank", "int64"), ("last_rank", "int64"),
+        ("rank_sort", "int64"), ("has_played", "bool_"),
+    ],
+    "entry_history": [
+        ("entry", "int64"), ("event", "int64"), ("points", "int64"), ("total_points", "int64"),
+        ("rank", "int64"), ("rank_sort", "int64"), ("overall_rank", "int64"),
+        ("percentile_rank", "int64"), ("bank", "int64"), ("value", "int64"),
+        ("event_transfers", "int64"), ("event_transfers_cost", "int64"), ("points_on_bench", "int64"),
+    ],
+}
+
+
+def season_for(events):
+    """ Season label such as 2024-25, from FPL_SEASON or the first gameweek deadline"""
+    if os.getenv("FPL_SEASON"):
+        return os.getenv("FPL_SEASON")
+    for event in events or []:
+        deadline = event.get("deadline_time")
+        if deadline:
+            year = int(deadline[:4])
+            return f"{year}-{(year + 1) % 100:02d}"
+    return "unknown"
+
+
+class LandingZone:
+    """ Writes raw FPL payloads as hive-partitioned Parquet through Arrow.
+
+        Rows are buffered per dataset and partition and converted to Arrow in
+        one Table.from_pylist call per part file against the dataset's
+        schema in SCHEMAS. Every part file name carries the run id, so runs
+        never overwrite each other, and every row carries it in a run_id
+        column, so readers can keep the latest copy of a row landed twice."""
+
+    def __init__(self, root):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.root = root
+        self.schemas = {
+            dataset: pyarrow.schema([(name, getattr(pyarrow, type_name)()) for name, type_name in fields])
+            for dataset, fields in SCHEMAS.items()
+        }
+        self.run_id = time.strftime("%Y%m%dT%H%M%S")
+        self.lock = threading.Lock()
+        self.buffers = {}
+        self.parts = 0
+        # Filled in from bootstrap-static by land_bootstrap
+        self.season = os.getenv("FPL_SEASON", "unknown")
+        self.gameweek = 0
+
+    def add(self, dataset, partition, rows):
+        """ Buffer rows for dataset/partition, flushing once FLUSH_ROWS is reached"""
+        if not rows:
+            return
+        key = (dataset, tuple(partition.items()))
+        with self.lock:
+            buffer = self.buffers.setdefault(key, [])
+            buffer.extend(rows)
+            if len(buffer) < FLUSH_ROWS:
+                return
+            self.buffers[key] = []
+        self._write(dataset, partition, buffer)
+
+    def _write(self, dataset, partition, rows):
+        try:
+            table = self.pa.Table.from_pylist(rows, schema=self.schemas[dataset])
+        except (self.pa.ArrowException, TypeError, ValueError) as e:
+            # Landing is a side copy; a payload that no longer fits the schema must not stop the load
+            logger.error(f"Error landing {len(rows)} {dataset} rows, payload does not match its schema: {e}")
+            return
+        table = table.append_column("run_id", self.pa.array([self.run_id] * len(rows), self.pa.string()))
+        directory = os.path.join(self.root, dataset, *(f"{k}={v}" for k, v in partition.items()))
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            self.parts += 1
+            name = f"{self.run_id}-{self.parts:05d}.parquet"
+        self.pq.write_table(table, os.path.join(directory, name), compression="zstd")
+
+    def flush(self, dataset=None):
+        """ Write out buffered rows, for one dataset or all of them"""
+        with self.lock:
+            pending = [(key, rows) for key, rows in self.buffers.items()
+                       if rows and (dataset is None or key[0] == dataset)]
+            for key, _ in pending:
+                self.buffers[key] = []
+        for (name, partition), rows in pending:
+            self._write(name, dict(partition), rows)
+
+
+_landing = None
+_landing_lock = threading.Lock()
+
+
+def get_landing():
+    """ The process-wide landing zone, or None when LANDING_DIR is unset or pyarrow is missing"""
+    global _landing
+    root = os.getenv("LANDING_DIR")
+    if not root:
+        return None
+
+    with _landing_lock:
+        if _landing is None:
+            try:
+                _landing = LandingZone(root)
+            except ImportError:
+                logger.warning("LANDING_DIR is set but pyarrow is not installed, skipping Parquet landing")
+                os.environ.pop("LANDING_DIR", None)
+                return None
+        return _landing
+
+
+def land_bootstrap(snapshot, tables=True):
+    """ Land the elements and teams of a bootstrap snapshot.
+
+        Also fixes the season and current gameweek used to partition the
+        standings and histories landed later in the run; without `tables`
+        only that is done."""
+    landing = get_landing()
+    if landing is None:
+        return
+    landing.season = season_for(snapshot.events)
+    landing.gameweek = current_event(snapshot.events)[0] or 0
+    if not tables:
+        return
+
+    partition = {"season": landing.season, "gameweek": landing.gameweek}
+    landing.add("elements", partition, snapshot.elements)
+    landing.add("teams", partition, snapshot.teams)
+    landing.flush("elements")
+    landing.flush("teams")
+
+
+def land_standings(league_id, results):
+    landing = get_landing()
+    if landing is None:
+        return
+    partition = {"season": landing.season, "gameweek": landing.gameweek, "league": league_id}
+    landing.add("standings", partition, results)
+
+
+def land_histories(league_id, all_data):
+    """ Land the entry history rows written by a run, one partition per gameweek.
+
+        `all_data` holds only new or changed rows, so an unchanged gameweek
+        is not landed again by every run."""
+    landing = get_landing()
+    if landing is None:
+        return
+    by_gameweek = {}
+    for entry, history in all_data.items():
+        for result in history:
+            by_gameweek.setdefault(result["event"], []).append(dict(result, entry=entry))
+    for gameweek, rows in by_gameweek.items():
+        landing.add("entry_history", {"season": landing.season, "gameweek": gameweek, "league": league_id}, rows)
+
+
+def close_landing():
+    if _landing is not None:
+        _landing.flush()
+        logger.info(f"Landed {_landing.parts} Parquet files under {_landing.root}")
@@ -0,0 +1,156 @@
+import io
+import json
+import logging
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# What a merge did with the rows it was given; skipped rows were left as they were
+Merged = namedtuple("Merged", ["inserted", "updated", "skipped"])
+
+_hashed_tables = set()
+_hashed_lock = threading.Lock()
+
+
+def _copy_value(value):
+    """ Render one value in Postgres COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    value = str(value)
+    return (value.replace("\\", "\\\\")
+                 .replace("\t", "\\t")
+                 .replace("\n", "\\n")
+                 .replace("\r", "\\r"))
+
+
+def _copy_buffer(rows):
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+
+def _csv_buffer(batch):
+    """ An Arrow table in CSV, written by Arrow rather than value by value"""
+    import pyarrow.csv
+
+    buf = io.BytesIO()
+    pyarrow.csv.write_csv(batch, buf, pyarrow.csv.WriteOptions(include_header=False))
+    buf.seek(0)
+    return buf
+
+
+def is_arrow(rows):
+    """ True for the Arrow tables built by transform.to_batch"""
+    return hasattr(rows, "num_rows")
+
+
+def _conflict_clause(conflict_columns, update_columns, where=None):
+    clause = f"ON CONFLICT ({', '.join(conflict_columns)}) "
+    if not update_columns:
+        return clause + "DO NOTHING"
+    assignments = ",\n    ".join(f"{col} = EXCLUDED.{col}" for col in update_columns)
+    clause += f"DO UPDATE SET\n    {assignments}"
+    return clause + f"\nWHERE {where}" if where else clause
+
+
+def ensure_hash_column(conn, table, hash_column):
+    """ Add the row hash column to `table` if it is missing, once per process; commits"""
+    with _hashed_lock:
+        if (table, hash_column) in _hashed_tables:
+            return
+        schema, name = table.split(".")
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s AND column_name = %s
+        """, (schema, name, hash_column))
+        if cursor.fetchone() is None:
+            # ADD COLUMN takes an exclusive lock, so only run it when the column is missing
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {hash_column} text")
+            logger.info(f"Added {hash_column} to {table}")
+        conn.commit()
+        _hashed_tables.add((table, hash_column))
+
+
+def upsert_sql(table, columns, conflict_columns, update_columns):
+    """ The row-by-row INSERT ... VALUES ... ON CONFLICT statement for a table"""
+    placeholders = ", ".join(["%s"] * len(columns))
+    return (f"INSERT INTO {table} ({', '.join(columns)})\n"
+            f"VALUES ({placeholders})\n"
+            f"{_conflict_clause(conflict_columns, update_columns)};")
+
+
+def row_upsert(conn, table, columns, rows, conflict_columns, update_columns=None):
+    """ Upsert rows one cursor.execute at a time (the original load path)"""
+    qry = upsert_sql(table, columns, conflict_columns, update_columns)
+    cursor = conn.cursor()
+    count = 0
+    for row in rows:
+        cursor.execute(qry, row)
+        count += 1
+    return count
+
+
+def bulk_upsert(conn, table, columns, rows, conflict_columns, update_columns=None, hash_column=None):
+    """ Upsert rows through a COPY-loaded staging table.
+
+        Rows are streamed into a temp table with COPY FROM STDIN and merged
+        into `table` with a single INSERT ... SELECT ... ON CONFLICT. When the
+        batch holds the same key twice the last row wins, as it would with
+        one execute per row. `update_columns=None` means DO NOTHING.
+        `rows` may also be an Arrow table in `columns` order, copied as CSV.
+
+        With `hash_column`, an md5 of the update columns is stored next to
+        each row and a conflicting row is only rewritten when its hash
+        changed, so unchanged rows cost no dead tuples or WAL. The column
+        must exist already, see ensure_hash_column.
+        Does not commit; returns a Merged count."""
+    if is_arrow(rows):
+        copy_sql, buf = "FROM STDIN WITH (FORMAT csv)", _csv_buffer(rows)
+    else:
+        rows = list(rows)
+        copy_sql, buf = "FROM STDIN", _copy_buffer(rows)
+    if not len(rows):
+        return Merged(0, 0, 0)
+
+    stage = "_stage_" + table.replace(".", "_")
+    column_list = ", ".join(columns)
+    key_list = ", ".join(conflict_columns)
+
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    cursor.execute(f"CREATE TEMP TABLE {stage} AS SELECT {column_list} FROM {table} WITH NO DATA")
+    cursor.copy_expert(f"COPY {stage} ({column_list}) {copy_sql}", buf)
+    insert_list, select_list, conflict = column_list, column_list, _conflict_clause(conflict_columns, update_columns)
+    if hash_column and update_columns:
+        insert_list += f", {hash_column}"
+        select_list += f", md5(ROW({', '.join(update_columns)})::text)"
+        conflict = _conflict_clause(conflict_columns, update_columns + [hash_column],
+                                    where=f"{table}.{hash_column} IS DISTINCT FROM EXCLUDED.{hash_column}")
+    # xmax is 0 only on freshly inserted tuples
+    cursor.execute(f"""
+        WITH merged AS (
+            INSERT INTO {table} ({insert_list})
+            SELECT DISTINCT ON ({key_list}) {select_list}
+            FROM {stage}
+            ORDER BY {key_list}, ctid DESC
+            {conflict}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+    """)
+    inserted, updated = cursor.fetchone()
+    cursor.execute(f"DROP TABLE {stage}")
+    return Merged(inserted, updated, len(rows) - inserted - updated)
+
+
+def upsert_table(conn, table, rows):
+    """ bulk_upsert rows into one of the tables described in tables.py"""
+    return bulk_upsert(conn, table.name, table.columns, rows,
+                       table.conflict_columns, table.update_columns, table.hash_column)
@@ -1,388 +1,128 @@
-import requests
 import os
-import re
 import logging
-import json
-import pandas as pd
 import psycopg2
+from concurrent.futures import as_completed
 from dotenv import load_dotenv
 
+# Load .env before the pipeline modules, some read their settings at import
 load_dotenv()
 
+from api import LEAGUE_URL
+from bootstrap import load_bootstrap
+from http_cache import get_cache, set_gameweek
+from landing import land_bootstrap, land_standings, land_histories, close_landing
+from metrics import StageExecutor, install_error_counter, instrumented, stage, write_metrics
+from db import connection_params, create_pool, pooled_connection, batched_upsert, load_stats
+from standings import iter_standings_pages, build_standings_index, StandingsCheckpoint
+from fetcher import ConcurrentFetcher, fetch_entry_histories
+from player_gameweeks import extract_player_gameweeks
+from manager_picks import extract_manager_picks, league_members
+from manifest import open_manifest
+from stages import STAGES, env_flag
+from sync_state import current_event, ensure_sync_table, load_sync_state, players_to_fetch, payload_hash, changed_results, save_sync_state
+from transform import to_batch
+from tables import ELEMENTS_TYPE, TEAMS, ELEMENTS_DETAILS, PLAYER_DETAILS, LEAGUE_DETAILS, GW_EVENTS
+
 # Configure logging to output to the console
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+install_error_counter()
 
-def element_types(conn):
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
+@instrumented("element_types")
+def element_types(conn, data):
+    """ Save the element types slice of the bootstrap snapshot"""
+    if not data:
+        logger.warning("No data found")
+        return
 
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()['element_types']
-
-        if data is None:
-            logger.warning("No data found")
-
-        try:
-            cursor = conn.cursor()
-            qry = """
-                INSERT INTO fpl.elements_type (
-                    id, singular_name, singular_name_short, element_count
-                ) VALUES (%s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    singular_name = EXCLUDED.singular_name,
-                    singular_name_short = EXCLUDED.singular_name_short,
-                    element_count = EXCLUDED.element_count;
-            """
-
-            for element_type in data: 
-                cursor.execute(qry, (
-                    element_type.get("id"),
-                    element_type.get("singular_name"),
-                    element_type.get("singular_name_short"),
-                    element_type.get("element_count")
-                ))
-
-            conn.commit()
-            logger.info("Element types saved successfully")
-
-        except Exception as e:
-            logger.error(f"Error saving element types: {e}")
-
+        batched_upsert(conn, ELEMENTS_TYPE, to_batch(ELEMENTS_TYPE, data))
+        logger.info("Element types saved successfully")
 
     except Exception as e:
-        logger.error(f"Error {e}")
+        logger.error(f"Error saving element types: {e}")
 
-def extract_teams(conn):
+@instrumented("extract_teams")
+def extract_teams(conn, data):
     """ Extract teams"""
-    team_url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    try:
-        response = requests.get(team_url)
-        response.raise_for_status()
-        data = response.json()['teams']
-
-        if data is None:
-            logger.warning("No team data found")
+    if not data:
+        logger.warning("No team data found")
+        return
 
-        try:
-            cursor = conn.cursor()
-            qry = """
-                INSERT into fpl.teams (team_code,team_name,short_name,strength,strength_overall_home,
-						strength_overall_away,strength_attack_home,strength_attack_away,
-						strength_defence_home,strength_defence_away,wins,draws,loss,played)
-			        VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON CONFLICT (team_code) DO UPdATE SET
-                    strength = EXCLUDED.strength,
-                    strength_overall_home = EXCLUDED.strength_overall_home,
-                    strength_overall_away = EXCLUDED.strength_overall_away,
-                    strength_attack_home = EXCLUDED.strength_attack_home,
-                    strength_attack_away = EXCLUDED.strength_attack_away,
-                    strength_defence_home = EXCLUDED.strength_defence_home,
-                    strength_defence_away = EXCLUDED.strength_defence_away,
-                    wins = EXCLUDED.wins,
-                    draws = EXCLUDED.draws,
-                    loss = EXCLUDED.loss;
-            """
-            
-            for team in data:
-                cursor.execute(qry,
-                               (
-                                   team["code"],team["name"],team["short_name"],team["strength"],team["strength_overall_home"],
-                                team["strength_overall_away"],team["strength_attack_home"],team["strength_attack_away"],team["strength_defence_home"],
-                                team["strength_defence_away"], team["win"],team["draw"],team["loss"],team["played"]
-                               ))
-            conn.commit()
-
-            logger.info("Team data saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving Team data {e}")
+    try:
+        batched_upsert(conn, TEAMS, to_batch(TEAMS, data))
 
-        # with open("team.json", "w") as f:
-        #     json.dump(data, f, indent=4)
+        logger.info("Team data saved successfully")
     except Exception as e:
-        logger.error(f"Error downloading league data {e}")
-
+        logger.error(f"Error saving Team data {e}")
 
-def extract_elements(conn):
-    """Extract the football players data"""
-    team_url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    try:
-        response = requests.get(team_url)
-        response.raise_for_status()
-        data = response.json()['elements']
+    # with open("team.json", "w") as f:
+    #     json.dump(data, f, indent=4)
 
-        if data is None:
-            logger.warning("No Element data found")
 
-        try:
-            cursor = conn.cursor()
-            qry = """
-                INSERT INTO fpl.elements_details (
-                    id, code, dreamteam_count, element_type, ep_next, ep_this, event_points,
-                    first_name, form, in_dreamteam, now_cost, points_per_game, second_name,
-                    selected_by_percent, special, team, team_code, total_points, transfers_in,
-                    transfers_in_event, transfers_out, transfers_out_event, value_form, value_season,
-                    web_name, region, team_join_date, birth_date, has_temporary_code, minutes,
-                    goals_scored, assists, clean_sheets, goals_conceded, own_goals, penalties_saved,
-                    penalties_missed, yellow_cards, red_cards, saves, bonus, bps, influence,
-                    creativity, threat, ict_index, clearances_blocks_interceptions, recoveries, tackles,
-                    defensive_contribution, starts, expected_goals, expected_assists, expected_goal_involvements,
-                    expected_goals_conceded, influence_rank, influence_rank_type, creativity_rank,
-                    creativity_rank_type, threat_rank, threat_rank_type, ict_index_rank, ict_index_rank_type,
-                    corners_and_indirect_freekicks_order, corners_and_indirect_freekicks_text,
-                    direct_freekicks_order, direct_freekicks_text, penalties_order, penalties_text,
-                    expected_goals_per_90, saves_per_90, expected_assists_per_90,
-                    expected_goal_involvements_per_90, expected_goals_conceded_per_90, goals_conceded_per_90,
-                    now_cost_rank, now_cost_rank_type, form_rank, form_rank_type,
-                    points_per_game_rank, points_per_game_rank_type, selected_rank, selected_rank_type,
-                    starts_per_90, clean_sheets_per_90, defensive_contribution_per_90
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s, %s,%s,%s,%s,
-                    %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                    code = EXCLUDED.code,
-                    dreamteam_count = EXCLUDED.dreamteam_count,
-                    element_type = EXCLUDED.element_type,
-                    ep_next = EXCLUDED.ep_next,
-                    ep_this = EXCLUDED.ep_this,
-                    event_points = EXCLUDED.event_points,
-                    first_name = EXCLUDED.first_name,
-                    form = EXCLUDED.form,
-                    in_dreamteam = EXCLUDED.in_dreamteam,
-                    now_cost = EXCLUDED.now_cost,
-                    points_per_game = EXCLUDED.points_per_game,
-                    second_name = EXCLUDED.second_name,
-                    selected_by_percent = EXCLUDED.selected_by_percent,
-                    special = EXCLUDED.special,
-                    team = EXCLUDED.team,
-                    team_code = EXCLUDED.team_code,
-                    total_points = EXCLUDED.total_points,
-                    transfers_in = EXCLUDED.transfers_in,
-                    transfers_in_event = EXCLUDED.transfers_in_event,
-                    transfers_out = EXCLUDED.transfers_out,
-                    transfers_out_event = EXCLUDED.transfers_out_event,
-                    value_form = EXCLUDED.value_form,
-                    value_season = EXCLUDED.value_season,
-                    web_name = EXCLUDED.web_name,
-                    region = EXCLUDED.region,
-                    team_join_date = EXCLUDED.team_join_date,
-                    birth_date = EXCLUDED.birth_date,
-                    has_temporary_code = EXCLUDED.has_temporary_code,
-                    minutes = EXCLUDED.minutes,
-                    goals_scored = EXCLUDED.goals_scored,
-                    assists = EXCLUDED.assists,
-                    clean_sheets = EXCLUDED.clean_sheets,
-                    goals_conceded = EXCLUDED.goals_conceded,
-                    own_goals = EXCLUDED.own_goals,
-                    penalties_saved = EXCLUDED.penalties_saved,
-                    penalties_missed = EXCLUDED.penalties_missed,
-                    yellow_cards = EXCLUDED.yellow_cards,
-                    red_cards = EXCLUDED.red_cards,
-                    saves = EXCLUDED.saves,
-                    bonus = EXCLUDED.bonus,
-                    bps = EXCLUDED.bps,
-                    influence = EXCLUDED.influence,
-                    creativity = EXCLUDED.creativity,
-                    threat = EXCLUDED.threat,
-                    ict_index = EXCLUDED.ict_index,
-                    clearances_blocks_interceptions = EXCLUDED.clearances_blocks_interceptions,
-                    recoveries = EXCLUDED.recoveries,
-                    tackles = EXCLUDED.tackles,
-                    defensive_contribution = EXCLUDED.defensive_contribution,
-                    starts = EXCLUDED.starts,
-                    expected_goals = EXCLUDED.expected_goals,
-                    expected_assists = EXCLUDED.expected_assists,
-                    expected_goal_involvements = EXCLUDED.expected_goal_involvements,
-                    expected_goals_conceded = EXCLUDED.expected_goals_conceded,
-                    influence_rank = EXCLUDED.influence_rank,
-                    influence_rank_type = EXCLUDED.influence_rank_type,
-                    creativity_rank = EXCLUDED.creativity_rank,
-                    creativity_rank_type = EXCLUDED.creativity_rank_type,
-                    threat_rank = EXCLUDED.threat_rank,
-                    threat_rank_type = EXCLUDED.threat_rank_type,
-                    ict_index_rank = EXCLUDED.ict_index_rank,
-                    ict_index_rank_type = EXCLUDED.ict_index_rank_type,
-                    corners_and_indirect_freekicks_order = EXCLUDED.corners_and_indirect_freekicks_order,
-                    corners_and_indirect_freekicks_text = EXCLUDED.corners_and_indirect_freekicks_text,
-                    direct_freekicks_order = EXCLUDED.direct_freekicks_order,
-                    direct_freekicks_text = EXCLUDED.direct_freekicks_text,
-                    penalties_order = EXCLUDED.penalties_order,
-                    penalties_text = EXCLUDED.penalties_text,
-                    expected_goals_per_90 = EXCLUDED.expected_goals_per_90,
-                    saves_per_90 = EXCLUDED.saves_per_90,
-                    expected_assists_per_90 = EXCLUDED.expected_assists_per_90,
-                    expected_goal_involvements_per_90 = EXCLUDED.expected_goal_involvements_per_90,
-                    expected_goals_conceded_per_90 = EXCLUDED.expected_goals_conceded_per_90,
-                    goals_conceded_per_90 = EXCLUDED.goals_conceded_per_90,
-                    now_cost_rank = EXCLUDED.now_cost_rank,
-                    now_cost_rank_type = EXCLUDED.now_cost_rank_type,
-                    form_rank = EXCLUDED.form_rank,
-                    form_rank_type = EXCLUDED.form_rank_type,
-                    points_per_game_rank = EXCLUDED.points_per_game_rank,
-                    points_per_game_rank_type = EXCLUDED.points_per_game_rank_type,
-                    selected_rank = EXCLUDED.selected_rank,
-                    selected_rank_type = EXCLUDED.selected_rank_type,
-                    starts_per_90 = EXCLUDED.starts_per_90,
-                    clean_sheets_per_90 = EXCLUDED.clean_sheets_per_90,
-                    defensive_contribution_per_90 = EXCLUDED.defensive_contribution_per_90;
-            """
-
-            for player in data:
-                cursor.execute(qry, (
-                    player.get("id"), player.get("code"), player.get("dreamteam_count"),
-                    player.get("element_type"), player.get("ep_next"), player.get("ep_this"),
-                    player.get("event_points"), player.get("first_name"), player.get("form"),
-                    player.get("in_dreamteam"), player.get("now_cost"), player.get("points_per_game"),
-                    player.get("second_name"), player.get("selected_by_percent"), player.get("special"),
-                    player.get("team"), player.get("team_code"), player.get("total_points"),
-                    player.get("transfers_in"), player.get("transfers_in_event"), player.get("transfers_out"),
-                    player.get("transfers_out_event"), player.get("value_form"), player.get("value_season"),
-                    player.get("web_name"), player.get("region"), player.get("team_join_date"),
-                    player.get("birth_date"), player.get("has_temporary_code"), player.get("minutes"),
-                    player.get("goals_scored"), player.get("assists"), player.get("clean_sheets"),
-                    player.get("goals_conceded"), player.get("own_goals"), player.get("penalties_saved"),
-                    player.get("penalties_missed"), player.get("yellow_cards"), player.get("red_cards"),
-                    player.get("saves"), player.get("bonus"), player.get("bps"), player.get("influence"),
-                    player.get("creativity"), player.get("threat"), player.get("ict_index"),
-                    player.get("clearances_blocks_interceptions"), player.get("recoveries"), player.get("tackles"),
-                    player.get("defensive_contribution"), player.get("starts"), player.get("expected_goals"),
-                    player.get("expected_assists"), player.get("expected_goal_involvements"),
-                    player.get("expected_goals_conceded"), player.get("influence_rank"), player.get("influence_rank_type"),
-                    player.get("creativity_rank"), player.get("creativity_rank_type"), player.get("threat_rank"),
-                    player.get("threat_rank_type"), player.get("ict_index_rank"), player.get("ict_index_rank_type"),
-                    player.get("corners_and_indirect_freekicks_order"), player.get("corners_and_indirect_freekicks_text"),
-                    player.get("direct_freekicks_order"), player.get("direct_freekicks_text"),
-                    player.get("penalties_order"), player.get("penalties_text"), player.get("expected_goals_per_90"),
-                    player.get("saves_per_90"), player.get("expected_assists_per_90"), player.get("expected_goal_involvements_per_90"),
-                    player.get("expected_goals_conceded_per_90"), player.get("goals_conceded_per_90"), player.get("now_cost_rank"),
-                    player.get("now_cost_rank_type"), player.get("form_rank"), player.get("form_rank_type"),
-                    player.get("points_per_game_rank"), player.get("points_per_game_rank_type"),
-                    player.get("selected_rank"), player.get("selected_rank_type"), player.get("starts_per_90"),
-                    player.get("clean_sheets_per_90"), player.get("defensive_contribution_per_90")
-                ))
-            conn.commit()
-            logger.info("Player data saved successfully")
+@instrumented("extract_elements")
+def extract_elements(conn, data):
+    """Extract the football players data"""
+    if not data:
+        logger.warning("No Element data found")
+        return
 
-        except Exception as e:
-            logger.error(f"Error saving Player data {e}")
+    try:
+        batched_upsert(conn, ELEMENTS_DETAILS, to_batch(ELEMENTS_DETAILS, data))
+        logger.info("Player data saved successfully")
 
     except Exception as e:
-        logger.error(f"Error downloading league data {e}")
+        logger.error(f"Error saving Player data {e}")
+
 
 def connect_to_db():
     """ Connect to Postgres Database"""
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('HOST', 'localhost'),   # fallback to localhost
-            port=os.getenv('PORT', 5432),
-            database=os.getenv('DATABASE'),
-            user=os.getenv('USERNAME'),
-            password=os.getenv('PASSWORD')
-        )
-        return conn
+        return psycopg2.connect(**connection_params())
     except Exception as e:
-        print(f"❌ Error connecting to Postgres: {e}")
-
-def extract_player(league_id,player_id):
-    """ Extract details of a single player in a league.
-        Details would be used to game week table"""
-    
-    all_results = []
-    page = 1
-    has_next = True
-
-    # Loop through all the pages for leagues with more than 50 players
-    while has_next:
-        league_URL = f"https://fantasy.premierleague.com/api/leagues-classic/{league_id}/standings/?page_standings={page}"
-        try:
-            response = requests.get(league_URL)
-            response.raise_for_status()
-            data = response.json()
-
-            results = data.get("standings", {}).get("results", [])
-            all_results.extend(results)
-
-            has_next = data.get("standings", {}).get("has_next", False)
-            page += 1
-        except Exception as e:
-            logger.error(f"Error getting player details: {e}")
-            break
-
-        if all_results is None:
-            logger.warning("Not found")
+        logger.error(f"❌ Error connecting to Postgres: {e}")
+        raise
 
+@instrumented("extract_players_info")
+def stream_players_info(league_id, conn, fetcher=None):
+    """ Upsert fpl.player_details one standings page at a time.
 
-    # return details of the filtered player
-    filtered = [player for player in all_results if player['entry'] == player_id]
-    return filtered
+        Returns the standings index (entry -> league ranks) in standings order.
+        A page that still fails after the fetcher's retries is raised, since a
+        partial index would load only part of the league; pages written by
+        the interrupted pass are skipped on the next run."""
+    checkpoint = StandingsCheckpoint(league_id)
+    standings_index, start_page = checkpoint.load()
 
+    try:
+        for page, results in iter_standings_pages(league_id, start_page, fetcher):
+            batched_upsert(conn, PLAYER_DETAILS, to_batch(PLAYER_DETAILS, results))
+            land_standings(league_id, results)
 
-def extract_players_info(league_id, conn):
-    """ Extracts all player information in a league"""
-    all_results = []
-    page = 1
-    has_next = True
-    while has_next:
-        league_URL = f"https://fantasy.premierleague.com/api/leagues-classic/{league_id}/standings/?page_standings={page}"
-        try:
-            response = requests.get(league_URL)
-            response.raise_for_status()  # ✅ fail fast if API request fails
-            data =  response.json()
-
-            results = data.get("standings", {}).get("results",[])
-            all_results.extend(results)
+            page_index = build_standings_index(results)
+            standings_index.update(page_index)
+            checkpoint.append(page, page_index)
 
-            has_next = data.get("standings", {}).get("has_next", False)
-            page += 1
-        except Exception as e:
-            logger.error(f"Error getting player details: {e}")
-            break
+        checkpoint.clear()
+        logger.info("Players detais downloaded")
+    except Exception as e:
+        logger.error(f"Error getting player details for league {league_id}, next run resumes from the last page saved: {e}")
+        raise
 
-    if all_results is None:
+    if not standings_index:
         logger.warning("No data found")
-    else:
-        try:
-            cursor = conn.cursor()
-            qry = """
-                    INSERT INTO fpl.player_details (team_id,player_name,team_name,total_point)
-                                    VALUES(%s,%s,%s,%s)
-                    ON CONFLICT (team_id) DO UPDATE
-                    SET team_name = EXCLUDED.team_name,
-                    total_point = EXCLUDED.total_point;      
-                    """
-            # WHERE fpl.player_details.team_name IS DISTINCT FROM EXCLUDED.team_name;
-
-            players_data = [(row["entry"],row["player_name"],row["entry_name"],row["event_total"] ) for row in all_results]
-            cursor.executemany(qry,players_data)
-            conn.commit()
-            logger.info("Players detais downloaded")
-        except Exception as e:
-            logger.error(f"Error saving player details {e}")
-        # Save to JSON
-        # with open("player_details.json", "w") as f:
-        #     json.dump(all_results, f, indent=4)
+    return standings_index
 
 
-    # Extract all the IDs
-    player_ids = [item['entry'] for item in all_results]
-    return player_ids
-
-def extract_league_data(league_id,conn):
+@instrumented("extract_league_data")
+def extract_league_data(league_id, conn, fetcher=None):
     """ Extract basic details of a league"""
-    league_URL = f"https://fantasy.premierleague.com/api/leagues-classic/{league_id}/standings/"
+    league_URL = LEAGUE_URL.format(league_id=league_id)
 
+    own_fetcher = fetcher is None
+    fetcher = fetcher or ConcurrentFetcher(max_workers=1)
     try:
-        response = requests.get(league_URL)
-        response.raise_for_status()
-        data = response.json()['league']
+        data = fetcher.get_json(league_URL)['league']
 
         if not data:
             logger.warning(f"No data found for league: {league_id}")
@@ -391,18 +131,7 @@ def extract_league_data(league_id,conn):
         #     json.dump(data, f, indent=4)
 
         try:
-            cursor = conn.cursor()
-            qry = """
-                INSERT INTO fpl.league_details(league_id,league_name,created_date)
-		                VALUES(%s,%s,%s)
-                ON CONFLICT (league_id) DO NOTHING;
-            """
-            lid = data["id"]
-            league_name = re.sub(r'[^\x00-\x7F]+','', data['name']) 
-            created_date = data["created"]
-            
-            cursor.execute(qry,(lid,league_name,created_date))
-            conn.commit()
+            batched_upsert(conn, LEAGUE_DETAILS, to_batch(LEAGUE_DETAILS, [data]))
 
             logger.info("league data saved successfully")
         except Exception as e:
@@ -410,111 +139,259 @@ def extract_league_data(league_id,conn):
 
     except Exception as e:
         logger.error(f"Error downloading league data {e}")
+    finally:
+        if own_fetcher:
+            fetcher.close()
 
-def extract_gw_data(league_id, player_ids, conn):
-    """ Extracts information for game week data with progress logging """
-    import time
 
-    logger.info(" ***Extracting information for game week data*** ")
-    all_data = {}
-    total_players = len(player_ids)
+def save_gw_data(league_id, all_data, conn, standings_index, events=None, state=None):
+    """ Upsert fetched manager histories into fpl.gw_events for one league.
 
-    # Step 1: Fetch all player history data
-    for i, player in enumerate(player_ids, start=1):
-        game_week_URL = f"https://fantasy.premierleague.com/api/entry/{player}/history"
-        try:
-            response = requests.get(game_week_URL)
-            response.raise_for_status()
-            data = response.json()['current']
-
-            if not data:
-                logger.warning(f"No data found for player {player}")
+        `state` is the league's sync state; when given, unchanged rows are
+        skipped and the high-water mark is saved once the rows are committed.
+        Managers with a rejected row keep their previous mark, so the next
+        run writes their rows again. The rows written are landed as Parquet.
+        Returns True once the league is committed."""
+    try:
+        changed = {}
+        unchanged = 0
+        for player_id, results in all_data.items():
+            previous = state.get(player_id) if state is not None else None
+            ranks = standings_index.get(player_id)
+            if previous and previous["payload_hash"] == payload_hash(results, ranks):
+                unchanged += 1
                 continue
+            changed[player_id] = list(changed_results(results, previous, ranks))
+
+        # One batch for every changed row, with the team and league ranks alongside
+        team_ids = [player_id for player_id, results in changed.items() for _ in results]
+        ranks = [standings_index.get(player_id, {}) for player_id in team_ids]
+        rows = to_batch(GW_EVENTS, [result for results in changed.values() for result in results], {
+            "team_id": team_ids,
+            "league_id": int(league_id),
+            "league_rank": [rank.get("rank") for rank in ranks],
+            "last_league_rank": [rank.get("last_rank") for rank in ranks],
+            "league_rank_sort": [rank.get("rank_sort") for rank in ranks],
+        })
+
+        rejected_rows = {(game_week, team_id) for game_week, team_id, _ in batched_upsert(conn, GW_EVENTS, rows)}
+        rejected = {team_id for _, team_id in rejected_rows}
+        if state is not None:
+            synced = {player_id: results for player_id, results in all_data.items() if player_id not in rejected}
+            save_sync_state(conn, league_id, synced, events, standings_index)
+            conn.commit()
+        land_histories(league_id, {
+            player_id: [result for result in results if (result["event"], player_id) not in rejected_rows]
+            for player_id, results in changed.items()
+        })
+        print(f"League {league_id}: saved GW data for {len(all_data)} players ({len(team_ids)} rows, {unchanged} unchanged)")
+        logger.info("Gameweek data saved successfully")
+        return True
 
-            all_data[player] = data
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error saving game week data {e}")
+        return False
 
-            # Display progress in console
-            print(f"[{i}/{total_players}] Fetched GW data for player {player}")
-        except Exception as e:
-            logger.error(f"Error downloading game week data for player {player}: {e}")
 
-        # Optional: small delay to avoid hitting API too hard
-        time.sleep(0.1)
+def _prepare_league(league_id, pool, incremental, events, fetcher):
+    """ Load league details and standings; returns what the gameweek load needs"""
+    with pooled_connection(pool) as conn:
+        extract_league_data(league_id=league_id, conn=conn, fetcher=fetcher)
+        standings_index = stream_players_info(league_id=league_id, conn=conn, fetcher=fetcher)
+        player_ids = list(standings_index)
 
-    # Step 2: Save data to DB
+        state = None
+        to_fetch = player_ids
+        if incremental:
+            state = load_sync_state(conn, league_id)
+            conn.commit()
+            to_fetch = players_to_fetch(player_ids, state, events)
+
+    return {
+        "player_ids": player_ids,
+        "to_fetch": to_fetch,
+        "standings_index": standings_index,
+        "state": state,
+    }
+
+
+def run_leagues(league_ids, pool, events=None, incremental=False, fetcher=None, max_parallel=None,
+                picks=False, manifest=None, histories=True):
+    """ Extract several leagues while fetching each manager's history only once.
+
+        Leagues are prepared and written in parallel on connections drawn from
+        `pool`; the entry histories of managers shared by several leagues are
+        fetched once and fanned out to every league they belong to. With
+        `picks` the squads of every member are loaded afterwards.
+
+        With a RunManifest, fetched histories survive a crash and leagues
+        already saved by the run being resumed are not saved again. Without
+        `histories` only league details and standings are loaded and the
+        sync state is not touched.
+        Returns True when every league was saved."""
+    # The sync state only decides which histories to fetch
+    incremental = incremental and histories
+    # Each league holds a pooled connection, and an exhausted pool raises instead of waiting
+    max_parallel = min(int(max_parallel or os.getenv("LEAGUE_PARALLELISM", 4)), pool.maxconn)
+    # One fetcher for every league, so they share its rate limit and retries
+    own_fetcher = fetcher is None
+    fetcher = fetcher or ConcurrentFetcher()
     try:
-        cursor = conn.cursor()
-        qry = """
-            INSERT INTO fpl.gw_events (
-                game_week, weeks_points, total_points, bank, transfers, transfer_cost, gross_points,
-                bench_points, team_id, league_id, overall_rank, team_value, league_rank, last_league_rank, league_rank_sort
-            )
-            VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (game_week,team_id,league_id) DO UPDATE SET
-                weeks_points = EXCLUDED.weeks_points,
-                total_points = EXCLUDED.total_points,
-                bank = EXCLUDED.bank,
-                transfers = EXCLUDED.transfers,
-                transfer_cost = EXCLUDED.transfer_cost,
-                gross_points = EXCLUDED.gross_points,
-                bench_points = EXCLUDED.bench_points,
-                overall_rank = EXCLUDED.overall_rank,
-                team_value = EXCLUDED.team_value,
-                league_rank = EXCLUDED.league_rank,
-                last_league_rank = EXCLUDED.last_league_rank,
-                league_rank_sort = EXCLUDED.league_rank_sort;
-        """
-
-        for j, (player_id, results) in enumerate(all_data.items(), start=1):
-            for result in results:
-                gross_point = result["points"] + result["event_transfers_cost"]
-
-                # Get league ranks
-                player_ranks = extract_player(league_id, player_id)
-                league_rank = player_ranks[0].get('rank')
-                last_league_rank = player_ranks[0].get('last_rank')
-                league_sort_rank = player_ranks[0].get('rank_sort')
-
-                values = (
-                    result["event"],
-                    result["points"],
-                    result["total_points"],
-                    result["bank"],
-                    result["event_transfers"],
-                    result["event_transfers_cost"],
-                    gross_point,
-                    result["points_on_bench"],
-                    player_id,
-                    int(league_id),
-                    result["overall_rank"],
-                    result['value'],
-                    league_rank,
-                    last_league_rank,
-                    league_sort_rank
-                )
-
-                cursor.execute(qry, values)
-
-            # Show DB insert progress
-            print(f"[{j}/{total_players}] Saved GW data for player {player_id}")
-
-        conn.commit()
-        logger.info("Gameweek data saved successfully")       
-
+        if incremental:
+            with pooled_connection(pool) as conn:
+                ensure_sync_table(conn)
+
+        leagues = {}
+        with StageExecutor(max_workers=max_parallel) as executor:
+            futures = {executor.submit(_prepare_league, league_id, pool, incremental, events, fetcher): league_id
+                       for league_id in league_ids}
+            for future in as_completed(futures):
+                league_id = futures[future]
+                try:
+                    leagues[league_id] = future.result()
+                except Exception as e:
+                    logger.error(f"Error preparing league {league_id}: {e}")
+
+        saved = []
+        if histories:
+            saved = _save_histories(league_ids, leagues, pool, events, fetcher, manifest, max_parallel)
+
+        if picks:
+            members = list(dict.fromkeys(
+                player for league_id in league_ids if league_id in leagues
+                for player in leagues[league_id]["player_ids"]
+            ))
+            save_manager_picks(pool, members, fetcher)
+
+        return len(leagues) == len(league_ids) and all(saved)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+
+def _save_histories(league_ids, leagues, pool, events, fetcher, manifest, max_parallel):
+    """ Fetch the histories of every prepared league once and save them per league"""
+    # Leagues saved by the run being resumed need nothing fetched
+    done = {league_id for league_id in leagues
+            if manifest is not None and manifest.stage_done(f"save_gw:{league_id}")}
+
+    # De-duplicate managers across leagues, keeping first-seen order
+    to_fetch = list(dict.fromkeys(
+        player for league_id in league_ids if league_id in leagues and league_id not in done
+        for player in leagues[league_id]["to_fetch"]
+    ))
+    total = sum(len(league["player_ids"]) for league in leagues.values())
+    logger.info(f"{total} league memberships across {len(leagues)} leagues, "
+                f"{len(to_fetch)} unique manager histories to fetch")
+
+    with stage("extract_gw_data"):
+        shared = fetch_entry_histories(to_fetch, fetcher, manifest)
+
+    def write(league_id):
+        if league_id in done:
+            logger.info(f"League {league_id} was saved by the resumed run, skipping")
+            return True
+        league = leagues[league_id]
+        all_data = {player: shared[player] for player in league["to_fetch"] if player in shared}
+        with pooled_connection(pool) as conn, stage("extract_gw_data"):
+            saved = save_gw_data(league_id, all_data, conn, league["standings_index"],
+                                 events=events, state=league["state"])
+        if saved and manifest is not None:
+            manifest.finish_stage(f"save_gw:{league_id}")
+        return saved
+
+    with StageExecutor(max_workers=max_parallel) as executor:
+        return list(executor.map(write, [league_id for league_id in league_ids if league_id in leagues]))
+
+
+def save_manager_picks(pool, members, fetcher=None):
+    """ Load the picks of `members`, logging instead of raising on failure"""
+    try:
+        with pooled_connection(pool) as conn:
+            extract_manager_picks(conn, members, fetcher)
     except Exception as e:
-        logger.error(f"Error saving game week data {e}")
+        logger.error(f"Error saving manager picks {e}")
 
-def main():
-    conn = connect_to_db()
-    league_id = os.getenv("LEAGUE_ID")
 
-    element_types(conn)
-    extract_teams(conn)
-    extract_elements(conn)
+def league_ids_from_env():
+    """ LEAGUE_IDS is a comma separated list; LEAGUE_ID is still honoured"""
+    raw = os.getenv("LEAGUE_IDS") or os.getenv("LEAGUE_ID") or ""
+    return [league_id.strip() for league_id in raw.split(",") if league_id.strip()]
 
-    extract_league_data(league_id=league_id, conn=conn)
-    player_ids=extract_players_info(league_id=league_id, conn=conn)
-    extract_gw_data(league_id,player_ids, conn=conn)
+
+def run_pipeline(pool, league_ids, incremental=True, picks=True, fetcher=None, live=False, stages=STAGES):
+    """ One extraction pass over the bootstrap tables and every league.
+
+        `stages` selects which of STAGES run; bootstrap-static is downloaded
+        only when a selected stage needs it. `live` is the light pass used
+        while matches are in play: only live player points, standings and
+        gameweek histories are refreshed.
+        Returns the bootstrap snapshot, or None when it was not loaded."""
+    snapshot = None
+    manifest = None
+    picks = picks and not live and "picks" in stages
+    try:
+        if {"bootstrap", "players", "histories"} & set(stages):
+            try:
+                with stage("bootstrap"):
+                    snapshot = load_bootstrap(fetcher=fetcher)
+                set_gameweek(*current_event(snapshot.events))
+                if "histories" in stages:
+                    manifest = open_manifest(*current_event(snapshot.events))
+                land_bootstrap(snapshot, tables="bootstrap" in stages and not live)
+                if "bootstrap" in stages and not live:
+                    with pooled_connection(pool) as conn:
+                        element_types(conn, snapshot.element_types)
+                        extract_teams(conn, snapshot.teams)
+                        extract_elements(conn, snapshot.elements)
+            except Exception as e:
+                logger.error(f"Error downloading bootstrap data {e}")
+
+        if snapshot is not None and "players" in stages:
+            try:
+                with pooled_connection(pool) as conn:
+                    extract_player_gameweeks(conn, snapshot.events, [p["id"] for p in snapshot.elements],
+                                             fetcher, summaries=not live)
+            except Exception as e:
+                logger.error(f"Error saving player gameweek data {e}")
+
+        if {"standings", "histories"} & set(stages):
+            complete = run_leagues(league_ids, pool, events=snapshot.events if snapshot else None,
+                                   incremental=incremental, fetcher=fetcher, picks=picks,
+                                   manifest=manifest, histories="histories" in stages)
+            # An incomplete run stays open so the next one resumes it
+            if complete and manifest is not None:
+                manifest.finish()
+        elif picks:
+            # Members are read from fpl.gw_events instead of paging through standings again
+            with pooled_connection(pool) as conn:
+                members = league_members(conn, league_ids)
+            save_manager_picks(pool, members, fetcher)
+    finally:
+        if manifest is not None:
+            manifest.close()
+    return snapshot
+
+
+def close_run(pool):
+    """ Close the pool and log what the run loaded, cached and landed"""
+    pool.closeall()
+    load_stats.log()
+    if get_cache() is not None:
+        logger.info(f"HTTP cache: {get_cache().stats()}")
+    close_landing()
+    write_metrics()
+
+
+def main():
+    pool = create_pool()
+    league_ids = league_ids_from_env()
+
+    try:
+        run_pipeline(pool, league_ids, incremental=env_flag("INCREMENTAL_SYNC"), picks=env_flag("MANAGER_PICKS"))
+    finally:
+        close_run(pool)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+from itertools import groupby
+
+from api import ENTRY_PICKS_URL
+from db import batched_upsert
+from fetcher import ConcurrentFetcher
+from metrics import instrumented
+from tables import SQUADS, MANAGER_PICKS
+
+logger = logging.getLogger(__name__)
+
+CREATE_PICKS_TABLES = """
+    CREATE TABLE IF NOT EXISTS fpl.squads (
+        squad_id text PRIMARY KEY,
+        elements integer[] NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS fpl.manager_picks (
+        team_id bigint NOT NULL,
+        game_week integer NOT NULL,
+        squad_id text NOT NULL,
+        bench integer[],
+        captain integer,
+        vice_captain integer,
+        active_chip text,
+        PRIMARY KEY (team_id, game_week)
+    );
+    CREATE INDEX IF NOT EXISTS manager_picks_gw ON fpl.manager_picks (game_week);
+"""
+
+
+def _pg_array(values):
+    return "{" + ",".join(str(value) for value in values) + "}"
+
+
+def squad_id(elements):
+    """ Stable id of a squad, independent of lineup order"""
+    return hashlib.sha1(_pg_array(sorted(elements)).encode()).hexdigest()[:16]
+
+
+def pick_rows(team_id, gameweek, payload):
+    """ Returns (squad row, fpl.manager_picks row) for one picks payload.
+
+        The squad is the sorted set of 15 players, so lineup changes and
+        captaincy do not create new squads; the bench order and captains are
+        kept on the manager's row instead."""
+    picks = sorted(payload.get("picks", []), key=lambda pick: pick["position"])
+    elements = sorted(pick["element"] for pick in picks)
+    squad = squad_id(elements)
+    bench = [pick["element"] for pick in picks if pick["position"] > 11]
+    captain = next((pick["element"] for pick in picks if pick.get("is_captain")), None)
+    vice_captain = next((pick["element"] for pick in picks if pick.get("is_vice_captain")), None)
+    return ((squad, _pg_array(elements)),
+            (team_id, gameweek, squad, _pg_array(bench), captain, vice_captain, payload.get("active_chip")))
+
+
+def missing_picks(conn, team_ids):
+    """ (team_id, gameweek) pairs played according to fpl.gw_events but not yet in fpl.manager_picks.
+
+        Picks are locked at the deadline, so a gameweek is fetched once."""
+    cursor = conn.cursor()
+    cursor.execute(CREATE_PICKS_TABLES)
+    cursor.execute("""
+        SELECT DISTINCT g.game_week, g.team_id
+        FROM fpl.gw_events g
+        WHERE g.team_id = ANY(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM fpl.manager_picks p
+              WHERE p.team_id = g.team_id AND p.game_week = g.game_week
+          )
+        ORDER BY g.game_week, g.team_id
+    """, ([int(team_id) for team_id in team_ids],))
+    pairs = [(int(team_id), int(gameweek)) for gameweek, team_id in cursor.fetchall()]
+    conn.commit()
+    return pairs
+
+
+def league_members(conn, league_ids):
+    """ Managers of the given leagues according to fpl.gw_events"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT team_id FROM fpl.gw_events WHERE league_id = ANY(%s) ORDER BY team_id",
+                   ([int(league_id) for league_id in league_ids],))
+    members = [int(team_id) for team_id, in cursor.fetchall()]
+    conn.commit()
+    return members
+
+
+@instrumented("manager_picks")
+def extract_manager_picks(conn, team_ids, fetcher=None):
+    """ Load the picks of every manager for each gameweek they played.
+
+        Work is done one gameweek at a time so memory stays bounded by the
+        number of managers, and each squad is written once however many
+        managers and gameweeks share it. fpl.manager_picks still holds a row
+        per manager gameweek with its bench, captains and chip; only
+        fpl.squads grows with transfers instead."""
+    pairs = missing_picks(conn, team_ids)
+    if not pairs:
+        logger.info("Manager picks are up to date")
+        return
+
+    own_fetcher = fetcher is None
+    fetcher = fetcher or ConcurrentFetcher()
+    seen = set()
+    total_picks = total_squads = 0
+    try:
+        for gameweek, group in groupby(pairs, key=lambda pair: pair[1]):
+            payloads = fetcher.fetch_all(
+                [team_id for team_id, _ in group],
+                lambda team_id: ENTRY_PICKS_URL.format(entry_id=team_id, event_id=gameweek),
+            )
+            squads, picks = [], []
+            for team_id, payload in payloads.items():
+                squad, row = pick_rows(team_id, gameweek, payload)
+                if squad[0] not in seen:
+                    seen.add(squad[0])
+                    squads.append(squad)
+                picks.append(row)
+
+            batched_upsert(conn, SQUADS, squads)
+            batched_upsert(conn, MANAGER_PICKS, picks)
+            total_squads += len(squads)
+            total_picks += len(picks)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+    logger.info(f"Manager picks saved: {total_picks} manager gameweeks sharing {total_squads} squads")
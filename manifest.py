@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from http_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# An unfinished run older than this is abandoned instead of resumed
+RESUME_WINDOW = int(os.getenv("RUN_RESUME_WINDOW", 6 * 3600))
+
+
+class RunManifest:
+    """ Durable record of a pipeline run: which stages finished and which
+        manager histories were fetched.
+
+        Histories are written through to SQLite as they arrive, so a run that
+        crashes mid-league is resumed by the next one in the same gameweek:
+        finished stages are skipped and only missing managers are fetched.
+        A run is not resumed once FPL has finalised the gameweek it started
+        in, since its stored histories predate the final points."""
+
+    def __init__(self, path, gameweek=None, finished=False):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Each commit is durable against a process crash without an fsync per manager
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                gameweek INTEGER,
+                gameweek_finished INTEGER NOT NULL DEFAULT 0,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                run_id INTEGER NOT NULL,
+                stage TEXT NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (run_id, stage)
+            );
+            CREATE TABLE IF NOT EXISTS histories (
+                run_id INTEGER NOT NULL,
+                entry_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (run_id, entry_id)
+            );
+        """)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(runs)")}
+        if "gameweek_finished" not in columns:
+            self.db.execute("ALTER TABLE runs ADD COLUMN gameweek_finished INTEGER NOT NULL DEFAULT 0")
+        self.run_id, self.resumed = self._start(gameweek, bool(finished))
+
+    def _start(self, gameweek, finished):
+        row = self.db.execute("""
+            SELECT run_id, gameweek, gameweek_finished, started_at FROM runs
+            WHERE finished_at IS NULL ORDER BY run_id DESC LIMIT 1
+        """).fetchone()
+        if row is not None:
+            run_id, run_gameweek, run_finished, started_at = row
+            # Histories stored while the gameweek was live would be saved as final
+            if (run_gameweek == gameweek and bool(run_finished) == finished
+                    and time.time() - started_at < RESUME_WINDOW):
+                fetched = self.db.execute("SELECT COUNT(*) FROM histories WHERE run_id = ?", (run_id,)).fetchone()[0]
+                logger.info(f"Resuming run {run_id} ({fetched} manager histories already fetched)")
+                return run_id, True
+            self._discard(run_id)
+
+        cursor = self.db.execute("INSERT INTO runs (gameweek, gameweek_finished, started_at) VALUES (?, ?, ?)",
+                                 (gameweek, int(finished), time.time()))
+        self.db.commit()
+        return cursor.lastrowid, False
+
+    def _discard(self, run_id):
+        self.db.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+        self.db.execute("DELETE FROM histories WHERE run_id = ?", (run_id,))
+        self.db.commit()
+
+    def stage_done(self, stage):
+        with self.lock:
+            row = self.db.execute("SELECT 1 FROM stages WHERE run_id = ? AND stage = ?",
+                                  (self.run_id, stage)).fetchone()
+        return row is not None
+
+    def finish_stage(self, stage):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?)", (self.run_id, stage, time.time()))
+            self.db.commit()
+
+    def save_history(self, entry_id, payload):
+        """ Write one fetched /entry/{id}/history payload through to disk"""
+        body = json.dumps(payload)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO histories VALUES (?, ?, ?)", (self.run_id, int(entry_id), body))
+            self.db.commit()
+
+    def load_histories(self, entry_ids):
+        """ Payloads already fetched by this run, as {entry_id: payload}"""
+        wanted = {int(entry_id) for entry_id in entry_ids}
+        with self.lock:
+            rows = self.db.execute("SELECT entry_id, payload FROM histories WHERE run_id = ?",
+                                   (self.run_id,)).fetchall()
+        return {entry_id: json.loads(payload) for entry_id, payload in rows if entry_id in wanted}
+
+    def finish(self):
+        """ Mark the run complete and drop its stored payloads"""
+        with self.lock:
+            self._discard(self.run_id)
+            self.db.execute("DELETE FROM stages WHERE run_id NOT IN (SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 50)")
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def open_manifest(gameweek=None, finished=False):
+    """ The run manifest under FPL_CACHE_DIR, or None when RUN_MANIFEST=off.
+
+        `gameweek` and `finished` are current_event() of the bootstrap events."""
+    setting = os.getenv("RUN_MANIFEST", os.path.join(CACHE_DIR, "manifest.sqlite"))
+    if setting.lower() in ("off", "0", "false", ""):
+        return None
+    return RunManifest(setting, gameweek, finished)
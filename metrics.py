@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the HTTP latency histogram buckets
+HTTP_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class StageMetrics:
+    """ Counters and timings collected for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.errors = 0
+        self.http_requests = 0
+        self.http_seconds = 0.0
+        self.http_bytes = 0
+        self.http_buckets = [0] * (len(HTTP_BUCKETS) + 1)
+        self.json_decode_seconds = 0.0
+        self.db_execute_seconds = 0.0
+        self.db_commit_seconds = 0.0
+        self.rows_written = 0
+
+    def as_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(HTTP_BUCKETS + ["+Inf"], self.http_buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 4),
+            "errors": self.errors,
+            "http_requests": self.http_requests,
+            "http_seconds": round(self.http_seconds, 4),
+            "http_bytes": self.http_bytes,
+            "http_latency_buckets": buckets,
+            "json_decode_seconds": round(self.json_decode_seconds, 4),
+            "db_execute_seconds": round(self.db_execute_seconds, 4),
+            "db_commit_seconds": round(self.db_commit_seconds, 4),
+            "rows_written": self.rows_written,
+        }
+
+
+_lock = threading.Lock()
+_stages = {}
+# Stage of the running thread; StageExecutor copies it into helper threads
+_stage = contextvars.ContextVar("stage", default=None)
+
+
+class StageExecutor(ThreadPoolExecutor):
+    """ ThreadPoolExecutor whose tasks run in a copy of the submitting
+        thread's context, so helper threads (fetch pools, page prefetch)
+        are attributed to the stage that submitted them"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _current():
+    name = _stage.get() or "other"
+    metrics = _stages.get(name)
+    if metrics is None:
+        metrics = _stages.setdefault(name, StageMetrics(name))
+    return metrics
+
+
+def _start_profiler(name):
+    mode = os.getenv("FPL_PROFILE", "").lower()
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another stage is already being profiled on a parallel thread
+            return None
+        return mode, profiler
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("FPL_PROFILE=pyinstrument but pyinstrument is not installed")
+            return None
+        profiler = Profiler()
+        profiler.start()
+        return mode, profiler
+    return None
+
+
+def _stop_profiler(name, started):
+    mode, profiler = started
+    out_dir = os.getenv("FPL_PROFILE_DIR", os.path.join(".fpl_cache", "profiles"))
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    if mode == "cprofile":
+        profiler.disable()
+        profiler.dump_stats(os.path.join(out_dir, f"{name}-{stamp}.prof"))
+    else:
+        profiler.stop()
+        with open(os.path.join(out_dir, f"{name}-{stamp}.html"), "w") as f:
+            f.write(profiler.output_html())
+
+
+@contextmanager
+def stage(name):
+    """ Attribute everything recorded in this block to a named stage.
+
+        With FPL_PROFILE=cprofile or pyinstrument the outermost entry of a
+        stage on a thread is profiled into FPL_PROFILE_DIR."""
+    previous = _stage.get()
+    token = _stage.set(name)
+    profiler = _start_profiler(name) if previous != name else None
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if previous != name:
+            with _lock:
+                metrics = _current()
+                metrics.calls += 1
+                metrics.seconds += elapsed
+        if profiler is not None:
+            _stop_profiler(name, profiler)
+        _stage.reset(token)
+
+
+def instrumented(name):
+    """ Decorator form of stage()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_http(seconds, nbytes):
+    with _lock:
+        metrics = _current()
+        metrics.http_requests += 1
+        metrics.http_seconds += seconds
+        metrics.http_bytes += nbytes
+        for i, bound in enumerate(HTTP_BUCKETS):
+            if seconds <= bound:
+                metrics.http_buckets[i] += 1
+                break
+        else:
+            metrics.http_buckets[-1] += 1
+
+
+def record_db(execute_seconds=0.0, commit_seconds=0.0, rows=0):
+    with _lock:
+        metrics = _current()
+        metrics.db_execute_seconds += execute_seconds
+        metrics.db_commit_seconds += commit_seconds
+        metrics.rows_written += rows
+
+
+def record_error(error=None):
+    """ Count one error against the current stage.
+
+        An exception is counted once however often it is logged and
+        re-raised on its way up, e.g. logged by a loader, raised through its
+        stage and logged again by the caller."""
+    if error is not None:
+        if getattr(error, "_fpl_error_counted", False):
+            return
+        try:
+            error._fpl_error_counted = True
+        except AttributeError:
+            pass
+    with _lock:
+        _current().errors += 1
+
+
+def decode_json(body):
+    """ json.loads with the decode time recorded against the current stage"""
+    start = time.perf_counter()
+    data = json.loads(body)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _current().json_decode_seconds += elapsed
+    return data
+
+
+class _ErrorCounter(logging.Handler):
+    """ Counts ERROR records so failures swallowed by except blocks still show up.
+
+        A record logged while an exception is handled counts as that exception."""
+
+    def emit(self, record):
+        record_error(record.exc_info[1] if record.exc_info else sys.exc_info()[1])
+
+
+def install_error_counter():
+    """ Count ERROR records on the root logger; call after logging is configured"""
+    root = logging.getLogger()
+    if not any(isinstance(handler, _ErrorCounter) for handler in root.handlers):
+        root.addHandler(_ErrorCounter(level=logging.ERROR))
+
+
+def snapshot():
+    with _lock:
+        return {name: metrics.as_dict() for name, metrics in _stages.items()}
+
+
+def _prometheus(stages):
+    lines = []
+    scalars = [
+        ("stage_seconds_total", "seconds", "counter", "Wall time spent in the stage"),
+        ("stage_errors_total", "errors", "counter", "Errors logged or raised in the stage"),
+        ("http_bytes_total", "http_bytes", "counter", "Response bytes downloaded"),
+        ("json_decode_seconds_total", "json_decode_seconds", "counter", "Time spent decoding JSON"),
+        ("db_execute_seconds_total", "db_execute_seconds", "counter", "Time spent executing writes"),
+        ("db_commit_seconds_total", "db_commit_seconds", "counter", "Time spent committing"),
+        ("rows_written_total", "rows_written", "counter", "Rows written to Postgres"),
+    ]
+    for metric, key, kind, help_text in scalars:
+        lines.append(f"# HELP fpl_{metric} {help_text}")
+        lines.append(f"# TYPE fpl_{metric} {kind}")
+        for name, values in stages.items():
+            lines.append(f'fpl_{metric}{{stage="{name}"}} {values[key]}')
+
+    lines.append("# HELP fpl_http_request_duration_seconds FPL API request latency")
+    lines.append("# TYPE fpl_http_request_duration_seconds histogram")
+    for name, values in stages.items():
+        for bound, count in values["http_latency_buckets"].items():
+            lines.append(f'fpl_http_request_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'fpl_http_request_duration_seconds_sum{{stage="{name}"}} {values["http_seconds"]}')
+        lines.append(f'fpl_http_request_duration_seconds_count{{stage="{name}"}} {values["http_requests"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=None):
+    """ Write the collected metrics to METRICS_PATH.
+
+        A path ending in .prom is written in the Prometheus textfile format,
+        anything else as JSON. The file is replaced atomically."""
+    path = path or os.getenv("METRICS_PATH")
+    if not path:
+        return
+    stages = snapshot()
+    body = _prometheus(stages) if path.endswith(".prom") else json.dumps(stages, indent=2)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write(body)
+    os.replace(path + ".tmp", path)
+    logger.info(f"Metrics written to {path}")
@@ -0,0 +1,127 @@
+import logging
+
+from api import EVENT_LIVE_URL, ELEMENT_SUMMARY_URL
+from db import batched_upsert
+from fetcher import ConcurrentFetcher
+from metrics import instrumented
+from transform import to_batch
+from tables import ELEMENT_GW_STATS, ELEMENT_FIXTURE_HISTORY, ELEMENT_GW_SYNC
+
+logger = logging.getLogger(__name__)
+
+CREATE_PLAYER_GW_TABLES = """
+    CREATE TABLE IF NOT EXISTS fpl.element_gw_stats (
+        element_id integer NOT NULL,
+        game_week integer NOT NULL,
+        minutes integer, goals_scored integer, assists integer, clean_sheets integer,
+        goals_conceded integer, own_goals integer, penalties_saved integer,
+        penalties_missed integer, yellow_cards integer, red_cards integer, saves integer,
+        bonus integer, bps integer, influence numeric, creativity numeric, threat numeric,
+        ict_index numeric, starts integer, expected_goals numeric, expected_assists numeric,
+        expected_goal_involvements numeric, expected_goals_conceded numeric,
+        total_points integer, in_dreamteam boolean,
+        PRIMARY KEY (element_id, game_week)
+    );
+    CREATE TABLE IF NOT EXISTS fpl.element_fixture_history (
+        element_id integer NOT NULL,
+        fixture_id integer NOT NULL,
+        game_week integer NOT NULL,
+        opponent_team integer, was_home boolean, kickoff_time timestamptz,
+        team_h_score integer, team_a_score integer, total_points integer,
+        minutes integer, goals_scored integer, assists integer, clean_sheets integer,
+        goals_conceded integer, own_goals integer, penalties_saved integer,
+        penalties_missed integer, yellow_cards integer, red_cards integer, saves integer,
+        bonus integer, bps integer, influence numeric, creativity numeric, threat numeric,
+        ict_index numeric, starts integer, expected_goals numeric, expected_assists numeric,
+        expected_goal_involvements numeric, expected_goals_conceded numeric,
+        value integer, transfers_balance integer, selected integer,
+        transfers_in integer, transfers_out integer,
+        PRIMARY KEY (element_id, fixture_id)
+    );
+    CREATE INDEX IF NOT EXISTS element_fixture_history_gw ON fpl.element_fixture_history (game_week);
+    CREATE TABLE IF NOT EXISTS fpl.element_gw_sync (
+        game_week integer PRIMARY KEY,
+        final boolean NOT NULL DEFAULT false,
+        synced_at timestamptz NOT NULL DEFAULT now()
+    );
+"""
+
+
+def _final_gameweeks(conn):
+    """ Gameweeks loaded after FPL finished checking their data"""
+    cursor = conn.cursor()
+    cursor.execute(CREATE_PLAYER_GW_TABLES)
+    cursor.execute("SELECT game_week FROM fpl.element_gw_sync WHERE final")
+    final = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return final
+
+
+def live_batch(live):
+    """ fpl.element_gw_stats batch from {gameweek: /event/{gw}/live/ payload}"""
+    elements = {gameweek: payload.get("elements", []) for gameweek, payload in live.items()}
+    return to_batch(
+        ELEMENT_GW_STATS,
+        [element for rows in elements.values() for element in rows],
+        {"game_week": [gameweek for gameweek, rows in elements.items() for _ in rows]},
+    )
+
+
+def fixture_batch(summaries, gameweeks):
+    """ fpl.element_fixture_history batch from {element id: /element-summary/{id}/ payload}"""
+    history = {
+        element_id: [fixture for fixture in payload.get("history", []) if fixture.get("round") in gameweeks]
+        for element_id, payload in summaries.items()
+    }
+    return to_batch(
+        ELEMENT_FIXTURE_HISTORY,
+        [fixture for rows in history.values() for fixture in rows],
+        {"element": [element_id for element_id, rows in history.items() for _ in rows]},
+    )
+
+
+@instrumented("player_gameweeks")
+def extract_player_gameweeks(conn, events, element_ids, fetcher=None, summaries=True):
+    """ Load per-gameweek player stats from event/live and element-summary.
+
+        Gameweeks already loaded after FPL marked them finished and data
+        checked are skipped, so a mid-season run only touches the current one.
+        `summaries=False` refreshes the live points only, one request per
+        gameweek, and leaves the gameweeks open for the next full load."""
+    final = _final_gameweeks(conn)
+    started = [event for event in events or [] if event.get("finished") or event.get("is_current")]
+    todo = [event["id"] for event in started if event["id"] not in final]
+    if not todo:
+        logger.info("Player gameweek data is up to date")
+        return
+
+    own_fetcher = fetcher is None
+    fetcher = fetcher or ConcurrentFetcher()
+    try:
+        # One live payload per gameweek covers every player
+        live = fetcher.fetch_all(todo, lambda gw: EVENT_LIVE_URL.format(event_id=gw))
+        stats = live_batch(live)
+        rejected = {gameweek for _, gameweek in batched_upsert(conn, ELEMENT_GW_STATS, stats)}
+
+        if not summaries:
+            logger.info(f"Live player points saved: {len(stats)} rows for gameweeks {todo[0]}-{todo[-1]}")
+            return
+
+        # Fixture-level history, restricted to the gameweeks being loaded
+        summary_payloads = fetcher.fetch_all(element_ids,
+                                             lambda element_id: ELEMENT_SUMMARY_URL.format(element_id=element_id))
+        history = fixture_batch(summary_payloads, set(todo))
+        history_rejected = batched_upsert(conn, ELEMENT_FIXTURE_HISTORY, history)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+    # Only gameweeks that loaded completely and were final can be skipped next time
+    checked = {event["id"] for event in started if event.get("finished") and event.get("data_checked")}
+    done = [(gw, gw in checked and gw not in rejected) for gw in todo if gw in live]
+    if len(summary_payloads) < len(element_ids) or history_rejected:
+        done = [(gw, False) for gw, _ in done]
+    batched_upsert(conn, ELEMENT_GW_SYNC, done)
+
+    logger.info(f"Player gameweek data saved: {len(stats)} gameweek rows, {len(history)} fixture rows "
+                f"for gameweeks {todo[0]}-{todo[-1]}")
@@ -0,0 +1,16 @@
+""" Pipeline stages and run settings shared by main.py, cli.py and watch.py.
+
+    Kept free of pipeline imports so cli.py can read them before deciding
+    what to load."""
+import os
+
+# Pipeline stages in the order run_pipeline runs them
+STAGES = ("bootstrap", "players", "standings", "histories", "picks")
+
+
+def env_flag(name, default=True):
+    """ A true/false setting from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import logging
+
+from api import STANDINGS_URL
+from fetcher import ConcurrentFetcher
+from http_cache import CACHE_DIR
+from metrics import StageExecutor
+
+logger = logging.getLogger(__name__)
+
+# A checkpoint older than this belongs to an abandoned run and is ignored
+CHECKPOINT_TTL = int(os.getenv("STANDINGS_CHECKPOINT_TTL", 6 * 3600))
+
+
+def _fetch_page(fetcher, league_id, page):
+    return fetcher.get_json(STANDINGS_URL.format(league_id=league_id, page=page)).get("standings", {})
+
+
+def iter_standings_pages(league_id, start_page=1, fetcher=None):
+    """ Yield (page, results) for a classic league, one page at a time.
+
+        The next page is requested in the background while the caller works
+        on the current one, so at most two pages are held in memory. Pages
+        go through `fetcher`, which retries 429/5xx; errors left after the
+        retries are raised to the caller."""
+    own_fetcher = fetcher is None
+    fetcher = fetcher or ConcurrentFetcher(max_workers=1)
+    try:
+        with StageExecutor(max_workers=1) as executor:
+            page = start_page
+            future = executor.submit(_fetch_page, fetcher, league_id, page)
+            while future is not None:
+                standings = future.result()
+                future = None
+                if standings.get("has_next", False):
+                    future = executor.submit(_fetch_page, fetcher, league_id, page + 1)
+                yield page, standings.get("results", [])
+                page += 1
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+
+def build_standings_index(results):
+    """ Map each entry to its league rank fields for O(1) lookups"""
+    return {
+        row["entry"]: {
+            "rank": row.get("rank"),
+            "last_rank": row.get("last_rank"),
+            "rank_sort": row.get("rank_sort"),
+        }
+        for row in results
+    }
+
+
+class StandingsCheckpoint:
+    """ Append-only record of the standings pages already written for a league.
+
+        Each line holds a page number and the compact index of that page, so
+        an interrupted run can rebuild its index and carry on from the next page."""
+
+    def __init__(self, league_id, cache_dir=CACHE_DIR):
+        self.path = os.path.join(cache_dir, f"standings-{league_id}.jsonl")
+
+    def load(self):
+        """ Returns (index, next page) from a recent checkpoint, or ({}, 1)"""
+        try:
+            if time.time() - os.path.getmtime(self.path) > CHECKPOINT_TTL:
+                self.clear()
+                return {}, 1
+            index = {}
+            last_page = 0
+            with open(self.path, "r") as f:
+                for line in f:
+                    record = json.loads(line)
+                    for entry, rank, last_rank, rank_sort in record["entries"]:
+                        index[entry] = {"rank": rank, "last_rank": last_rank, "rank_sort": rank_sort}
+                    last_page = record["page"]
+        except (OSError, ValueError):
+            return {}, 1
+
+        if last_page:
+            logger.info(f"Resuming standings from page {last_page + 1} ({len(index)} entries already written)")
+        return index, last_page + 1
+
+    def append(self, page, page_index):
+        entries = [[entry, r["rank"], r["last_rank"], r["rank_sort"]] for entry, r in page_index.items()]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"page": page, "entries": entries}) + "\n")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
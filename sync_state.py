@@ -0,0 +1,130 @@
+import json
+import hashlib
+import logging
+
+from loader import upsert_table
+from tables import GW_SYNC_STATE
+
+logger = logging.getLogger(__name__)
+
+CREATE_SYNC_STATE = """
+    CREATE TABLE IF NOT EXISTS fpl.gw_sync_state (
+        league_id bigint NOT NULL,
+        team_id bigint NOT NULL,
+        last_event integer,
+        last_event_finished boolean NOT NULL DEFAULT false,
+        payload_hash text,
+        event_hashes jsonb,
+        synced_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (league_id, team_id)
+    );
+"""
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def _league_ranks(ranks):
+    """ The standings ranks written on every fpl.gw_events row of a manager"""
+    ranks = ranks or {}
+    return [ranks.get("rank"), ranks.get("last_rank"), ranks.get("rank_sort")]
+
+
+def _row_hash(result, ranks):
+    return _digest([result, _league_ranks(ranks)])[:12]
+
+
+def payload_hash(history, ranks=None):
+    """ Hash of a manager's whole `current` history and their league ranks.
+
+        The ranks come from standings and change when other managers overtake,
+        so they are hashed with the history they are written alongside."""
+    return _digest([history, _league_ranks(ranks)])
+
+
+def event_hashes(history, ranks=None):
+    """ Short hash per gameweek row and league ranks, keyed by str(event) as stored in jsonb"""
+    return {str(result["event"]): _row_hash(result, ranks) for result in history}
+
+
+def current_event(events):
+    """ Returns (event id, finished) for the current gameweek, or (None, False)"""
+    for event in events or []:
+        if event.get("is_current"):
+            return event["id"], bool(event.get("finished") and event.get("data_checked"))
+    return None, False
+
+
+def ensure_sync_table(conn):
+    """ Create fpl.gw_sync_state on first use and commit"""
+    cursor = conn.cursor()
+    cursor.execute(CREATE_SYNC_STATE)
+    conn.commit()
+
+
+def load_sync_state(conn, league_id):
+    """ Load the high-water mark of every manager in a league"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT team_id, last_event, last_event_finished, payload_hash, event_hashes
+        FROM fpl.gw_sync_state WHERE league_id = %s
+    """, (int(league_id),))
+    return {
+        team_id: {
+            "last_event": last_event,
+            "last_event_finished": finished,
+            "payload_hash": digest,
+            "event_hashes": hashes or {},
+        }
+        for team_id, last_event, finished, digest, hashes in cursor.fetchall()
+    }
+
+
+def players_to_fetch(player_ids, state, events):
+    """ Managers whose history may have changed since the last sync.
+
+        A manager synced after the current gameweek finished cannot have new
+        history until the next gameweek starts, so they are skipped."""
+    event_id, finished = current_event(events)
+    if event_id is None or not finished:
+        return list(player_ids)
+
+    return [
+        player for player in player_ids
+        if not (state.get(player)
+                and state[player]["last_event"] == event_id
+                and state[player]["last_event_finished"])
+    ]
+
+
+def changed_results(history, previous, ranks=None):
+    """ Yield only the gameweek rows that are new or differ from the last sync.
+
+        A change of league rank changes every row, since each row carries it."""
+    if previous is None:
+        yield from history
+        return
+
+    old_hashes = previous["event_hashes"]
+    for result in history:
+        if old_hashes.get(str(result["event"])) != _row_hash(result, ranks):
+            yield result
+
+
+def save_sync_state(conn, league_id, all_data, events, standings_index=None):
+    """ Record the new high-water mark of every fetched manager. Does not commit"""
+    standings_index = standings_index or {}
+    event_id, finished = current_event(events)
+    rows = []
+    for player_id, history in all_data.items():
+        last_event = max(result["event"] for result in history)
+        rows.append((
+            int(league_id),
+            player_id,
+            last_event,
+            finished and last_event == event_id,
+            payload_hash(history, standings_index.get(player_id)),
+            event_hashes(history, standings_index.get(player_id)),
+        ))
+    upsert_table(conn, GW_SYNC_STATE, rows)
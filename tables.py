@@ -0,0 +1,179 @@
+from collections import namedtuple
+
+# One entry per fpl.* table written by the pipeline. `update_columns` are the
+# columns refreshed on conflict; an empty list means ON CONFLICT DO NOTHING.
+# `sources` maps a column to the payload field it is read from ("a.b" reads a
+# nested field) or to a Derived expression; unmapped columns are read from the
+# field of the same name. See transform.py. Tables with a `hash_column` keep
+# a hash of the update columns there and skip rows whose hash is unchanged.
+Table = namedtuple("Table", ["name", "columns", "conflict_columns", "update_columns", "sources", "hash_column"],
+                   defaults=[None, None])
+
+# A column computed from payload fields with a pyarrow.compute function
+Derived = namedtuple("Derived", ["function", "fields", "options"], defaults=[{}])
+
+ELEMENTS_TYPE = Table(
+    name="fpl.elements_type",
+    columns=["id", "singular_name", "singular_name_short", "element_count"],
+    conflict_columns=["id"],
+    update_columns=["singular_name", "singular_name_short", "element_count"],
+)
+
+TEAMS = Table(
+    name="fpl.teams",
+    columns=[
+        "team_code", "team_name", "short_name", "strength", "strength_overall_home",
+        "strength_overall_away", "strength_attack_home", "strength_attack_away",
+        "strength_defence_home", "strength_defence_away", "wins", "draws", "loss", "played",
+    ],
+    conflict_columns=["team_code"],
+    update_columns=[
+        "strength", "strength_overall_home", "strength_overall_away", "strength_attack_home",
+        "strength_attack_away", "strength_defence_home", "strength_defence_away",
+        "wins", "draws", "loss",
+    ],
+    sources={"team_code": "code", "team_name": "name", "wins": "win", "draws": "draw"},
+    hash_column="row_hash",
+)
+
+ELEMENT_COLUMNS = [
+    "id", "code", "dreamteam_count", "element_type", "ep_next", "ep_this", "event_points",
+    "first_name", "form", "in_dreamteam", "now_cost", "points_per_game", "second_name",
+    "selected_by_percent", "special", "team", "team_code", "total_points", "transfers_in",
+    "transfers_in_event", "transfers_out", "transfers_out_event", "value_form", "value_season",
+    "web_name", "region", "team_join_date", "birth_date", "has_temporary_code", "minutes",
+    "goals_scored", "assists", "clean_sheets", "goals_conceded", "own_goals",
+    "penalties_saved", "penalties_missed", "yellow_cards", "red_cards", "saves", "bonus",
+    "bps", "influence", "creativity", "threat", "ict_index", "clearances_blocks_interceptions",
+    "recoveries", "tackles", "defensive_contribution", "starts", "expected_goals",
+    "expected_assists", "expected_goal_involvements", "expected_goals_conceded",
+    "influence_rank", "influence_rank_type", "creativity_rank", "creativity_rank_type",
+    "threat_rank", "threat_rank_type", "ict_index_rank", "ict_index_rank_type",
+    "corners_and_indirect_freekicks_order", "corners_and_indirect_freekicks_text",
+    "direct_freekicks_order", "direct_freekicks_text", "penalties_order", "penalties_text",
+    "expected_goals_per_90", "saves_per_90", "expected_assists_per_90",
+    "expected_goal_involvements_per_90", "expected_goals_conceded_per_90",
+    "goals_conceded_per_90", "now_cost_rank", "now_cost_rank_type", "form_rank",
+    "form_rank_type", "points_per_game_rank", "points_per_game_rank_type", "selected_rank",
+    "selected_rank_type", "starts_per_90", "clean_sheets_per_90",
+    "defensive_contribution_per_90",
+]
+
+ELEMENTS_DETAILS = Table(
+    name="fpl.elements_details",
+    columns=ELEMENT_COLUMNS,
+    conflict_columns=["id"],
+    update_columns=ELEMENT_COLUMNS[1:],
+    hash_column="row_hash",
+)
+
+PLAYER_DETAILS = Table(
+    name="fpl.player_details",
+    columns=["team_id", "player_name", "team_name", "total_point"],
+    conflict_columns=["team_id"],
+    update_columns=["team_name", "total_point"],
+    sources={"team_id": "entry", "team_name": "entry_name", "total_point": "event_total"},
+)
+
+LEAGUE_DETAILS = Table(
+    name="fpl.league_details",
+    columns=["league_id", "league_name", "created_date"],
+    conflict_columns=["league_id"],
+    update_columns=[],
+    sources={
+        "league_id": "id",
+        "league_name": Derived("replace_substring_regex", ["name"],
+                               {"pattern": r"[^\x00-\x7F]+", "replacement": ""}),
+        "created_date": "created",
+    },
+)
+
+GW_EVENTS = Table(
+    name="fpl.gw_events",
+    columns=[
+        "game_week", "weeks_points", "total_points", "bank", "transfers", "transfer_cost",
+        "gross_points", "bench_points", "team_id", "league_id", "overall_rank", "team_value",
+        "league_rank", "last_league_rank", "league_rank_sort",
+    ],
+    conflict_columns=["game_week", "team_id", "league_id"],
+    update_columns=[
+        "weeks_points", "total_points", "bank", "transfers", "transfer_cost", "gross_points",
+        "bench_points", "overall_rank", "team_value", "league_rank", "last_league_rank",
+        "league_rank_sort",
+    ],
+    # save_gw_data supplies team_id, league_id and the league ranks
+    sources={
+        "game_week": "event",
+        "weeks_points": "points",
+        "transfers": "event_transfers",
+        "transfer_cost": "event_transfers_cost",
+        "gross_points": Derived("add", ["points", "event_transfers_cost"]),
+        "bench_points": "points_on_bench",
+        "team_value": "value",
+    },
+)
+
+ALL_TABLES = [ELEMENTS_TYPE, TEAMS, ELEMENTS_DETAILS, PLAYER_DETAILS, LEAGUE_DETAILS, GW_EVENTS]
+
+# Control table for incremental gameweek sync, see sync_state.py
+GW_SYNC_STATE = Table(
+    name="fpl.gw_sync_state",
+    columns=["league_id", "team_id", "last_event", "last_event_finished", "payload_hash", "event_hashes"],
+    conflict_columns=["league_id", "team_id"],
+    update_columns=["last_event", "last_event_finished", "payload_hash", "event_hashes"],
+)
+
+# Per-gameweek player tables, see player_gameweeks.py
+LIVE_STAT_COLUMNS = [
+    "minutes", "goals_scored", "assists", "clean_sheets", "goals_conceded", "own_goals",
+    "penalties_saved", "penalties_missed", "yellow_cards", "red_cards", "saves", "bonus", "bps",
+    "influence", "creativity", "threat", "ict_index", "starts", "expected_goals", "expected_assists",
+    "expected_goal_involvements", "expected_goals_conceded", "total_points", "in_dreamteam",
+]
+
+ELEMENT_GW_STATS = Table(
+    name="fpl.element_gw_stats",
+    columns=["element_id", "game_week"] + LIVE_STAT_COLUMNS,
+    conflict_columns=["element_id", "game_week"],
+    update_columns=LIVE_STAT_COLUMNS,
+    sources=dict({"element_id": "id"}, **{col: f"stats.{col}" for col in LIVE_STAT_COLUMNS}),
+)
+
+FIXTURE_HISTORY_COLUMNS = [
+    "opponent_team", "was_home", "kickoff_time", "team_h_score", "team_a_score", "total_points",
+    "minutes", "goals_scored", "assists", "clean_sheets", "goals_conceded", "own_goals",
+    "penalties_saved", "penalties_missed", "yellow_cards", "red_cards", "saves", "bonus", "bps",
+    "influence", "creativity", "threat", "ict_index", "starts", "expected_goals", "expected_assists",
+    "expected_goal_involvements", "expected_goals_conceded", "value", "transfers_balance",
+    "selected", "transfers_in", "transfers_out",
+]
+
+ELEMENT_FIXTURE_HISTORY = Table(
+    name="fpl.element_fixture_history",
+    columns=["element_id", "fixture_id", "game_week"] + FIXTURE_HISTORY_COLUMNS,
+    conflict_columns=["element_id", "fixture_id"],
+    update_columns=["game_week"] + FIXTURE_HISTORY_COLUMNS,
+    sources={"element_id": "element", "fixture_id": "fixture", "game_week": "round"},
+)
+
+ELEMENT_GW_SYNC = Table(
+    name="fpl.element_gw_sync",
+    columns=["game_week", "final"],
+    conflict_columns=["game_week"],
+    update_columns=["final"],
+)
+
+# Distinct 15-player squads, shared by every manager gameweek that fielded them
+SQUADS = Table(
+    name="fpl.squads",
+    columns=["squad_id", "elements"],
+    conflict_columns=["squad_id"],
+    update_columns=[],
+)
+
+MANAGER_PICKS = Table(
+    name="fpl.manager_picks",
+    columns=["team_id", "game_week", "squad_id", "bench", "captain", "vice_captain", "active_chip"],
+    conflict_columns=["team_id", "game_week"],
+    update_columns=["squad_id", "bench", "captain", "vice_captain", "active_chip"],
+)
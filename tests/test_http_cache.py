@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import http_cache
+from http_cache import FOREVER, LIVE_EVENT_TTL, LIVE_HISTORY_TTL, ResponseCache, set_gameweek, ttl_for
+
+HISTORY_URL = "https://fantasy.premierleague.com/api/entry/7/history/"
+LIVE_URL = "https://fantasy.premierleague.com/api/event/5/live/"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    set_gameweek(5, False)
+    yield ResponseCache(str(tmp_path / "http.sqlite"), 1024 * 1024)
+    set_gameweek(None, False)
+
+
+def age(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(http_cache.time, "time", lambda: now)
+
+
+def test_ttl_follows_gameweek_state():
+    set_gameweek(5, False)
+    assert ttl_for(HISTORY_URL) == LIVE_HISTORY_TTL
+    assert ttl_for(LIVE_URL) == LIVE_EVENT_TTL
+    set_gameweek(5, True)
+    assert ttl_for(HISTORY_URL) == FOREVER
+    assert ttl_for(LIVE_URL) == FOREVER
+    set_gameweek(None, False)
+
+
+@pytest.mark.parametrize("url", [HISTORY_URL, LIVE_URL])
+def test_live_body_is_not_served_once_gameweek_is_final(cache, monkeypatch, url):
+    cache.put(url, b"live")
+    age(monkeypatch, 24 * 3600)
+    assert cache.get(url) is None
+
+    set_gameweek(5, True)
+    assert cache.get(url) is None
+
+
+@pytest.mark.parametrize("url", [HISTORY_URL, LIVE_URL])
+def test_fresh_live_body_is_not_served_once_gameweek_is_final(cache, url):
+    cache.put(url, b"live")
+    assert cache.get(url) == b"live"
+
+    set_gameweek(5, True)
+    assert cache.get(url) is None
+
+
+def test_final_body_stays_fresh(cache, monkeypatch):
+    set_gameweek(5, True)
+    cache.put(HISTORY_URL, b"final")
+    age(monkeypatch, 24 * 3600)
+    assert cache.get(HISTORY_URL) == b"final"
+
+
+def test_entries_without_expiry_are_stale(tmp_path):
+    path = str(tmp_path / "http.sqlite")
+    set_gameweek(5, True)
+    cache = ResponseCache(path, 1024 * 1024)
+    cache.put(HISTORY_URL, b"final")
+    cache._db().execute("UPDATE responses SET expires_at = NULL")
+    cache._db().commit()
+    assert cache.get(HISTORY_URL) is None
+    set_gameweek(None, False)
@@ -0,0 +1,37 @@
+from manager_picks import pick_rows, squad_id
+
+
+def payload(elements, captain, chip=None):
+    return {"active_chip": chip, "picks": [
+        {"element": element, "position": position, "is_captain": element == captain,
+         "is_vice_captain": position == 2}
+        for position, element in enumerate(elements, 1)
+    ]}
+
+
+SQUAD = list(range(101, 116))
+
+
+def test_squad_id_ignores_lineup_order():
+    assert squad_id(SQUAD) == squad_id(list(reversed(SQUAD)))
+    assert squad_id(SQUAD) != squad_id(SQUAD[:-1] + [200])
+
+
+def test_pick_rows_split_squad_and_lineup():
+    squad, picks = pick_rows(7, 3, payload(SQUAD, captain=105, chip="bboost"))
+    assert squad == (squad_id(SQUAD), "{" + ",".join(map(str, SQUAD)) + "}")
+    assert picks == (7, 3, squad_id(SQUAD), "{112,113,114,115}", 105, 102, "bboost")
+
+
+def test_lineup_and_captain_changes_share_the_squad():
+    first, _ = pick_rows(7, 3, payload(SQUAD, captain=105))
+    reordered = SQUAD[4:] + SQUAD[:4]
+    second, picks = pick_rows(7, 4, payload(reordered, captain=110))
+    assert first == second
+    assert picks[3] == "{101,102,103,104}" and picks[4] == 110
+
+
+def test_transfer_creates_a_new_squad():
+    first, _ = pick_rows(7, 3, payload(SQUAD, captain=105))
+    second, _ = pick_rows(7, 4, payload(SQUAD[:-1] + [200], captain=105))
+    assert first[0] != second[0]
@@ -0,0 +1,42 @@
+import sqlite3
+
+from manifest import RunManifest
+
+
+def test_resumes_unfinished_run_in_same_gameweek(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    first = RunManifest(path, 3)
+    first.save_history(7, [{"event": 3}])
+    first.finish_stage("save_gw:1")
+    first.close()
+
+    second = RunManifest(path, 3)
+    assert second.resumed and second.run_id == first.run_id
+    assert second.load_histories([7]) == {7: [{"event": 3}]}
+    assert second.stage_done("save_gw:1")
+
+
+def test_does_not_resume_once_gameweek_is_final(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    live = RunManifest(path, 3, finished=False)
+    live.save_history(7, [{"event": 3, "points": 40}])
+    live.close()
+
+    final = RunManifest(path, 3, finished=True)
+    assert not final.resumed
+    assert final.load_histories([7]) == {}
+    assert not final.stage_done("save_gw:1")
+
+
+def test_adds_finished_flag_to_existing_manifest(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, gameweek INTEGER,"
+               " started_at REAL NOT NULL, finished_at REAL)")
+    db.commit()
+    db.close()
+
+    manifest = RunManifest(path, 3, finished=True)
+    assert not manifest.resumed
+    manifest.close()
+    assert RunManifest(path, 3, finished=True).resumed
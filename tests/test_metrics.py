@@ -0,0 +1,52 @@
+import logging
+
+import metrics
+from metrics import StageExecutor, install_error_counter, instrumented, record_http, stage
+
+
+def errors(name):
+    return metrics.snapshot().get(name, {}).get("errors", 0)
+
+
+def test_error_logged_and_raised_counts_once():
+    install_error_counter()
+    log = logging.getLogger("test_metrics")
+
+    @instrumented("test_log_and_raise")
+    def load():
+        try:
+            raise ValueError("bad page")
+        except ValueError as e:
+            log.error(f"Error loading {e}")
+            raise
+
+    try:
+        load()
+    except ValueError as e:
+        log.error(f"Error in caller {e}")
+    assert errors("test_log_and_raise") == 1
+
+
+def test_separate_failures_are_counted():
+    install_error_counter()
+    log = logging.getLogger("test_metrics")
+    with stage("test_separate"):
+        log.error("first")
+        log.error("second")
+    assert errors("test_separate") == 2
+
+
+def test_helper_threads_count_against_submitting_stage():
+    def fetch():
+        record_http(0.01, 10)
+
+    with StageExecutor(max_workers=4) as executor:
+        with stage("test_league_a"):
+            first = [executor.submit(fetch) for _ in range(3)]
+        with stage("test_league_b"):
+            second = [executor.submit(fetch) for _ in range(2)]
+        for future in first + second:
+            future.result()
+
+    assert metrics.snapshot()["test_league_a"]["http_requests"] == 3
+    assert metrics.snapshot()["test_league_b"]["http_requests"] == 2
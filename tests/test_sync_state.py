@@ -0,0 +1,51 @@
+from sync_state import changed_results, current_event, event_hashes, payload_hash, players_to_fetch
+
+LIVE = [{"id": 4, "is_current": False, "finished": True, "data_checked": True},
+        {"id": 5, "is_current": True, "finished": False, "data_checked": False}]
+FINAL = [{"id": 5, "is_current": True, "finished": True, "data_checked": True}]
+HISTORY = [{"event": 4, "points": 50}, {"event": 5, "points": 61}]
+RANKS = {"rank": 2, "last_rank": 3, "rank_sort": 2}
+
+
+def synced(history, ranks=RANKS, last_event=5, finished=True):
+    return {"last_event": last_event, "last_event_finished": finished,
+            "payload_hash": payload_hash(history, ranks), "event_hashes": event_hashes(history, ranks)}
+
+
+def test_current_event_needs_finished_and_data_checked():
+    assert current_event(LIVE) == (5, False)
+    assert current_event(FINAL) == (5, True)
+    assert current_event([{"id": 5, "is_current": True, "finished": True, "data_checked": False}]) == (5, False)
+    assert current_event([]) == (None, False)
+
+
+def test_every_row_is_new_without_previous_sync():
+    assert list(changed_results(HISTORY, None, RANKS)) == HISTORY
+
+
+def test_only_changed_rows_are_yielded():
+    previous = synced(HISTORY)
+    history = [HISTORY[0], dict(HISTORY[1], points=65), {"event": 6, "points": 40}]
+    assert list(changed_results(history, previous, RANKS)) == history[1:]
+    assert list(changed_results(HISTORY, previous, RANKS)) == []
+
+
+def test_league_rank_change_rewrites_every_row():
+    previous = synced(HISTORY)
+    overtaken = dict(RANKS, rank=3, last_rank=2)
+    assert payload_hash(HISTORY, overtaken) != previous["payload_hash"]
+    assert list(changed_results(HISTORY, previous, overtaken)) == HISTORY
+
+
+def test_everyone_is_fetched_while_gameweek_is_live():
+    state = {1: synced(HISTORY)}
+    assert players_to_fetch([1, 2], state, LIVE) == [1, 2]
+
+
+def test_managers_synced_after_gameweek_finished_are_skipped():
+    state = {
+        1: synced(HISTORY),
+        2: synced(HISTORY, finished=False),
+        3: synced(HISTORY[:1], last_event=4),
+    }
+    assert players_to_fetch([1, 2, 3, 4], state, FINAL) == [2, 3, 4]
@@ -0,0 +1,66 @@
+import pytest
+
+import transform
+from tables import ELEMENTS_TYPE, ELEMENT_GW_STATS, GW_EVENTS, LEAGUE_DETAILS
+from transform import _python_rows, to_batch
+
+pytest.importorskip("pyarrow")
+
+
+def arrow_rows(table, records, extra=None):
+    batch = to_batch(table, records, extra)
+    assert hasattr(batch, "num_rows"), "expected an Arrow batch"
+    return [tuple(row.values()) for row in batch.to_pylist()]
+
+
+def test_ragged_records_match_python_rows():
+    records = [
+        {"id": 1, "singular_name": "Goalkeeper"},
+        {"id": 2, "singular_name": "Defender", "singular_name_short": "DEF", "element_count": 5},
+    ]
+    rows = arrow_rows(ELEMENTS_TYPE, records)
+    assert rows == _python_rows(ELEMENTS_TYPE, records, {})
+    assert rows[1][3] == 5
+
+
+def test_field_missing_from_every_record_loads_as_null():
+    records = [{"id": 1}, {"id": 2}]
+    assert arrow_rows(ELEMENTS_TYPE, records) == [(1, None, None, None), (2, None, None, None)]
+
+
+def test_ragged_nested_fields_match_python_rows():
+    records = [
+        {"id": 1, "stats": {"minutes": 90}},
+        {"id": 2, "stats": {"minutes": 45, "goals_scored": 1}},
+        {"id": 3},
+    ]
+    extra = {"game_week": 4}
+    assert arrow_rows(ELEMENT_GW_STATS, records, extra) == _python_rows(ELEMENT_GW_STATS, records, extra)
+
+
+def test_derived_columns_and_extra_match_python_rows():
+    records = [
+        {"event": 1, "points": 50, "total_points": 50, "event_transfers_cost": 4},
+        {"event": 2, "points": 60, "total_points": 110, "event_transfers_cost": 0, "bank": 3},
+    ]
+    extra = {"team_id": [7, 7], "league_id": 1, "league_rank": [2, 1]}
+    rows = arrow_rows(GW_EVENTS, records, extra)
+    assert rows == _python_rows(GW_EVENTS, records, extra)
+    assert rows[0][GW_EVENTS.columns.index("gross_points")] == 54
+
+
+def test_league_name_regex_matches_python_rows():
+    records = [{"id": 9, "name": "Ligue ✨ One", "created": "2024-07-01T00:00:00Z"}]
+    rows = arrow_rows(LEAGUE_DETAILS, records)
+    assert rows == _python_rows(LEAGUE_DETAILS, records, {})
+    assert rows[0][1] == "Ligue  One"
+
+
+def test_python_fallback_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(transform, "_load_pyarrow", lambda: None)
+    records = [{"id": 1}, {"id": 2, "element_count": 5}]
+    assert to_batch(ELEMENTS_TYPE, records) == [(1, None, None, None), (2, None, None, 5)]
+
+
+def test_empty_records():
+    assert to_batch(ELEMENTS_TYPE, []) == []
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+from watch import DAILY_INTERVAL, HOURLY_INTERVAL, LIVE_INTERVAL, SETTLING_INTERVAL, plan_next_tick
+
+NOW = datetime(2024, 9, 14, 15, 0, tzinfo=timezone.utc)
+
+
+def at(delta):
+    return (NOW + delta).isoformat().replace("+00:00", "Z")
+
+
+def events(checked=False, deadline=timedelta(days=6)):
+    return [{"id": 4, "is_current": True, "finished": checked, "data_checked": checked,
+             "deadline_time": at(timedelta(days=-1))},
+            {"id": 5, "is_current": False, "deadline_time": at(deadline)}]
+
+
+def test_live_while_a_match_is_in_play():
+    fixtures = [{"kickoff_time": at(timedelta(minutes=-30)), "started": True}]
+    assert plan_next_tick(events(), fixtures, NOW) == ("live", LIVE_INTERVAL)
+
+
+def test_live_after_kickoff_before_fpl_flags_it():
+    fixtures = [{"kickoff_time": at(timedelta(minutes=-1))}]
+    assert plan_next_tick(events(), fixtures, NOW) == ("live", LIVE_INTERVAL)
+
+
+def test_finished_matches_are_not_live():
+    fixtures = [{"kickoff_time": at(timedelta(minutes=-30)), "started": True, "finished_provisional": True},
+                {"kickoff_time": at(timedelta(hours=3))}]
+    assert plan_next_tick(events(), fixtures, NOW) == ("full", HOURLY_INTERVAL)
+
+
+def test_settling_until_bonus_points_are_confirmed():
+    fixtures = [{"kickoff_time": at(timedelta(hours=-3)), "finished_provisional": True}]
+    assert plan_next_tick(events(), fixtures, NOW) == ("full", SETTLING_INTERVAL)
+
+
+def test_wakes_up_just_after_the_next_kickoff():
+    fixtures = [{"kickoff_time": at(timedelta(minutes=10))}]
+    assert plan_next_tick(events(), fixtures, NOW) == ("full", 10 * 60 + 60)
+
+
+def test_daily_when_the_next_deadline_is_days_away():
+    fixtures = [{"kickoff_time": at(timedelta(hours=-3)), "finished_provisional": True}]
+    assert plan_next_tick(events(checked=True), fixtures, NOW) == ("full", DAILY_INTERVAL)
+
+
+def test_daily_when_nothing_is_scheduled():
+    assert plan_next_tick(events(checked=True, deadline=timedelta(days=-7)), [], NOW) == ("full", DAILY_INTERVAL)
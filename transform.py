@@ -0,0 +1,114 @@
+import re
+import logging
+import importlib
+
+from tables import Derived
+
+logger = logging.getLogger(__name__)
+
+# pyarrow is imported on the first batch, so commands that write nothing start fast
+pyarrow = None
+
+# Row-at-a-time equivalents of the pyarrow.compute functions used by Derived
+# columns, for installs without pyarrow
+PYTHON_FUNCTIONS = {
+    "add": lambda a, b: None if a is None or b is None else a + b,
+    "replace_substring_regex": lambda value, pattern, replacement:
+        None if value is None else re.sub(pattern, replacement, value),
+}
+
+
+def _load_pyarrow():
+    """ The pyarrow module, or None when it is not installed"""
+    global pyarrow
+    if pyarrow is None:
+        try:
+            importlib.import_module("pyarrow.compute")
+            pyarrow = importlib.import_module("pyarrow")
+        except ImportError:
+            pyarrow = False
+    return pyarrow or None
+
+
+def source_of(table, column):
+    """ Where a table column comes from: a payload field, or a Derived expression"""
+    return (table.sources or {}).get(column, column)
+
+
+def _python_field(records, field, extra, length):
+    if field in extra:
+        value = extra[field]
+        return value if isinstance(value, list) else [value] * length
+    path = field.split(".")
+    values = []
+    for record in records:
+        for key in path:
+            record = record.get(key) if record is not None else None
+        values.append(record)
+    return values
+
+
+def _python_rows(table, records, extra):
+    length = len(records)
+    columns = []
+    for column in table.columns:
+        source = source_of(table, column)
+        if isinstance(source, Derived):
+            function = PYTHON_FUNCTIONS[source.function]
+            args = [_python_field(records, field, extra, length) for field in source.fields]
+            columns.append([function(*values, **source.options) for values in zip(*args)])
+        else:
+            columns.append(_python_field(records, source, extra, length))
+    return list(zip(*columns))
+
+
+def _arrow_field(records, columns, field, extra, length):
+    if field in extra:
+        value = extra[field]
+        return pyarrow.array(value) if isinstance(value, list) else pyarrow.repeat(value, length)
+    name, *path = field.split(".")
+    # Built from every record, not the first one's keys, so ragged payloads keep their values
+    if name not in columns:
+        columns[name] = pyarrow.array([record.get(name) for record in records])
+    values = columns[name]
+    for key in path:
+        if not pyarrow.types.is_struct(values.type) or values.type.get_field_index(key) < 0:
+            return pyarrow.nulls(length)
+        values = pyarrow.compute.struct_field(values, key)
+    return values
+
+
+def _arrow_table(table, records, extra):
+    columns = {}
+    length = len(records)
+    arrays = []
+    for column in table.columns:
+        source = source_of(table, column)
+        if isinstance(source, Derived):
+            function = getattr(pyarrow.compute, source.function)
+            args = [_arrow_field(records, columns, field, extra, length) for field in source.fields]
+            arrays.append(function(*args, **source.options))
+        else:
+            arrays.append(_arrow_field(records, columns, source, extra, length))
+    return pyarrow.table(arrays, names=table.columns)
+
+
+def to_batch(table, records, extra=None):
+    """ Turn a list of API dicts into a batch for batched_upsert, driven by table.sources.
+
+        With pyarrow installed each mapped field is converted to an Arrow
+        column across all records, derived columns are computed over whole columns and the loader COPYs
+        the batch as CSV written by Arrow. Without it, or when a payload does
+        not convert cleanly, row tuples are built from the same column map.
+        `extra` adds fields that are not in the payload, as a list with one
+        value per record or a single value for all of them. Fields missing
+        from the payload load as NULL and unmapped fields are ignored."""
+    extra = extra or {}
+    if not records:
+        return []
+    if _load_pyarrow() is not None:
+        try:
+            return _arrow_table(table, records, extra)
+        except (pyarrow.ArrowException, TypeError, ValueError) as e:
+            logger.debug(f"Building {table.name} row by row, payload is not Arrow friendly: {e}")
+    return _python_rows(table, records, extra)
@@ -0,0 +1,129 @@
+""" Long-running mode that keeps the fpl.* tables fresh through a season.
+
+    Usage: python watch.py
+
+    The events in bootstrap-static and the current gameweek's fixtures decide
+    how soon the next tick runs: every WATCH_LIVE_INTERVAL seconds while
+    matches are in play, every WATCH_SETTLING_INTERVAL while bonus points
+    are being confirmed, and hourly or daily in between, waking up for the
+    next kickoff or deadline. Live ticks refresh only live points, standings
+    and gameweek histories; other ticks run the full pipeline. The HTTP
+    session, response cache and database pool stay open between ticks. A
+    tick that fails, for example while Postgres restarts, is logged and
+    retried after WATCH_LIVE_INTERVAL, doubling up to WATCH_SETTLING_INTERVAL."""
+import os
+import signal
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from main import close_run, run_pipeline, league_ids_from_env
+from api import FIXTURES_URL
+from db import create_pool
+from fetcher import ConcurrentFetcher
+from landing import close_landing
+from metrics import write_metrics
+from stages import env_flag
+from sync_state import current_event
+
+logger = logging.getLogger(__name__)
+
+LIVE_INTERVAL = int(os.getenv("WATCH_LIVE_INTERVAL", 120))
+SETTLING_INTERVAL = int(os.getenv("WATCH_SETTLING_INTERVAL", 900))
+HOURLY_INTERVAL = int(os.getenv("WATCH_HOURLY_INTERVAL", 3600))
+DAILY_INTERVAL = int(os.getenv("WATCH_DAILY_INTERVAL", 86400))
+# A match is treated as in play this long after kickoff when FPL has not flagged it yet
+MATCH_WINDOW = timedelta(hours=2)
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def load_fixtures(event_id, fetcher):
+    """ Fixtures of one gameweek, or [] when they cannot be loaded"""
+    if event_id is None:
+        return []
+    try:
+        return fetcher.get_json(FIXTURES_URL.format(event_id=event_id))
+    except Exception as e:
+        logger.error(f"Error downloading fixtures for gameweek {event_id} {e}")
+        return []
+
+
+def plan_next_tick(events, fixtures, now=None):
+    """ Returns (mode, seconds to wait): mode "live" while matches are in play, else "full" """
+    now = now or datetime.now(timezone.utc)
+
+    kickoffs = []
+    for fixture in fixtures:
+        kickoff = _parse_time(fixture.get("kickoff_time"))
+        if kickoff is None or fixture.get("finished_provisional"):
+            continue
+        if fixture.get("started") or kickoff <= now < kickoff + MATCH_WINDOW:
+            return "live", LIVE_INTERVAL
+        if kickoff > now:
+            kickoffs.append(kickoff)
+
+    event_id, checked = current_event(events)
+    if event_id is not None and fixtures and not kickoffs and not checked:
+        return "full", SETTLING_INTERVAL
+
+    deadlines = [_parse_time(event.get("deadline_time")) for event in events or []]
+    upcoming = sorted(t for t in kickoffs + [d for d in deadlines if d] if t > now)
+    if not upcoming:
+        return "full", DAILY_INTERVAL
+
+    until = (upcoming[0] - now).total_seconds()
+    interval = HOURLY_INTERVAL if until <= DAILY_INTERVAL else DAILY_INTERVAL
+    # Wake up just after the next kickoff or deadline rather than sleeping through it
+    return "full", max(min(interval, until + 60), 60)
+
+
+def watch(stop=None, league_ids=None, incremental=None):
+    """ Run ticks until `stop` is set or SIGTERM/SIGINT is received.
+
+        `league_ids` and `incremental` default to LEAGUE_IDS and INCREMENTAL_SYNC."""
+    stop = stop or threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+
+    pool = create_pool()
+    fetcher = ConcurrentFetcher()
+    league_ids = league_ids or league_ids_from_env()
+    incremental = env_flag("INCREMENTAL_SYNC") if incremental is None else incremental
+    picks = env_flag("MANAGER_PICKS")
+    mode = "full"
+    failures = 0
+
+    try:
+        while not stop.is_set():
+            logger.info(f"Watch tick ({mode})")
+            try:
+                snapshot = run_pipeline(pool, league_ids, incremental=incremental, picks=picks,
+                                        fetcher=fetcher, live=mode == "live")
+                close_landing()
+                write_metrics()
+
+                if snapshot is None:
+                    mode, wait = "full", SETTLING_INTERVAL
+                else:
+                    event_id, _ = current_event(snapshot.events)
+                    mode, wait = plan_next_tick(snapshot.events, load_fixtures(event_id, fetcher))
+                failures = 0
+            except Exception as e:
+                # e.g. Postgres restarting; the pool drops dead connections and the next tick reconnects
+                failures += 1
+                wait = min(LIVE_INTERVAL * 2 ** (failures - 1), SETTLING_INTERVAL)
+                logger.error(f"Watch tick failed ({failures} in a row), retrying in {wait:.0f}s: {e}")
+            logger.info(f"Next {mode} tick in {wait:.0f}s")
+            stop.wait(wait)
+    finally:
+        fetcher.close()
+        close_run(pool)
+
+
+if __name__ == "__main__":
+    watch()